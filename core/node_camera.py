@@ -1,44 +1,66 @@
 #!/usr/bin/env python3
 
-import cv2
+# Adds the lib directory to the Python path
 import sys
-import time
 import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import cv2
+import time
+from lib.frame_ring import FrameRing, RING_NAME
 
 # Constants
-OUTPUT_FILE = "camera_feed.png"
-CAPTURE_INTERVAL = 0.1  # 2 times per second
+FRAME_WIDTH = 640
+FRAME_HEIGHT = 480
+FRAME_RATE = 30
 
 def main():
-    # Initialize camera
+    # Initialize camera. This is the only process that opens it and decodes MJPEG;
+    # everything else attaches to the shared-memory ring with lib.frame_ring.SharedCamera
     cap = cv2.VideoCapture(0)
-    
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, FRAME_WIDTH)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, FRAME_HEIGHT)
+    cap.set(cv2.CAP_PROP_FPS, FRAME_RATE)
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc('M', 'J', 'P', 'G'))
+
     if not cap.isOpened():
         print("Error: Could not open camera")
         sys.exit(1)
-        
+
+    ret, frame = cap.read()
+    if not ret:
+        print("Error: Could not grab frame from camera")
+        sys.exit(1)
+
+    ring = FrameRing.create(frame.shape)
     print("Camera initialized successfully")
-    print(f"Capturing frames every {CAPTURE_INTERVAL} seconds")
-    
+    print(f"Publishing {frame.shape[1]}x{frame.shape[0]} frames to shared memory '{RING_NAME}'")
+
+    frames = 0
+    last_report = time.monotonic()
     try:
         while True:
-            # Capture frame
+            # Blocks until the driver hands over the next frame, so the ring
+            # always holds the freshest one without any grab()/read() tricks
             ret, frame = cap.read()
-            
             if not ret:
                 print("Error: Could not grab frame from camera")
                 break
-                
-            # Save the frame
-            cv2.imwrite(OUTPUT_FILE, frame)
-            
-            # Wait for next capture
-            time.sleep(CAPTURE_INTERVAL)
-            
+            ring.write(frame, time.time())
+
+            frames += 1
+            now = time.monotonic()
+            if now - last_report >= 10.0:
+                print(f"[node_camera.py] {frames / (now - last_report):.1f} fps")
+                frames = 0
+                last_report = now
+
     except KeyboardInterrupt:
         print("\nStopping camera capture")
     finally:
         cap.release()
+        ring.close()
         print("Camera released")
 
 if __name__ == "__main__":
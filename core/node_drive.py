@@ -11,6 +11,7 @@ import json
 import time
 import paho.mqtt.client as mqtt
 from lib.odrive_uart import ODriveUART
+from lib.tracing import Tracer
 
 # Constants
 MQTT_BROKER_ADDRESS = "localhost"
@@ -18,9 +19,18 @@ MQTT_TOPIC = "robot/drive"
 LINEAR_SPEED = 0.4
 ANGULAR_SPEED = 1.2
 WHEEL_BASE = 0.4
+ODRIVE_UART_PORT = '/dev/ttyAMA1'
+
+# Set STUFFBOT_SIM=host:port to talk to core/node_sim.py instead of the ODrive
+SIM_ENDPOINT = os.getenv("STUFFBOT_SIM")
+if SIM_ENDPOINT:
+    ODRIVE_UART_PORT = f"socket://{SIM_ENDPOINT}"
 
 # Load motor directions from JSON
 def load_motor_dirs():
+    if SIM_ENDPOINT:
+        # Simulated wheels are both forward-positive
+        return {'left': 1, 'right': 1}
     try:
         with open(os.path.expanduser('~/quickstart/lib/motor_dir.json'), 'r') as f:
             return json.load(f)
@@ -32,7 +42,7 @@ motor_dirs = load_motor_dirs()
 
 # Initialize motor controller
 motor_controller = ODriveUART(
-    port='/dev/ttyAMA1',
+    port=ODRIVE_UART_PORT,
     left_axis=0, right_axis=1,
     dir_left=motor_dirs['left'], dir_right=motor_dirs['right']
 )
@@ -57,6 +67,8 @@ def set_velocity(linear, angular):
     motor_controller.set_speed_mps_right(right)
     print(f"Set speeds: Left={left} m/s, Right={right} m/s")
 
+tracer = Tracer("node_drive")
+
 # MQTT Callbacks
 def on_connect(client, userdata, flags, rc):
     print(f"Connected with result code {rc}")
@@ -70,7 +82,8 @@ def on_message(client, userdata, msg):
         # Handle JSON command
         data = json.loads(payload)
         if 'linear_velocity' in data and 'angular_velocity' in data:
-            set_velocity(data['linear_velocity'], data['angular_velocity'])
+            with tracer.span("set_velocity", Tracer.extract(data)):
+                set_velocity(data['linear_velocity'], data['angular_velocity'])
     except json.JSONDecodeError:
         # Handle simple text commands
         command_map = {
@@ -86,6 +99,7 @@ def on_message(client, userdata, msg):
 # Main loop
 def main():
     client = mqtt.Client()
+    tracer.client = client
     client.on_connect = on_connect
     client.on_message = on_message
 
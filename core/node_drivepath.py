@@ -1,10 +1,18 @@
 #!/usr/bin/env python3
 
+# Adds the lib directory to the Python path
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
 import json
 import time
 import math
 import paho.mqtt.client as mqtt
+from lib.tracing import Tracer
 
+# node_localplanner.py is an obstacle-aware replacement for this node. Both
+# publish robot/drive, so run one or the other, never both.
 MQTT_BROKER             = "localhost"
 MQTT_PORT               = 1883
 MQTT_TOPIC_PATH_PLAN    = "robot/local_path"
@@ -26,6 +34,8 @@ robot_x       = 0.0
 robot_y       = 0.0
 robot_th      = 0.0  # Radians
 state         = 'IDLE'
+path_trace    = None  # Trace of the path message being followed
+tracer        = Tracer("node_drivepath")
 
 def wrap_angle(angle):
     return (angle + math.pi) % (2.0 * math.pi) - math.pi
@@ -37,8 +47,9 @@ def on_message(client, userdata, msg):
         on_odometry(msg)
 
 def on_path_plan(msg):
-    global path_xy, current_index, state
+    global path_xy, current_index, state, path_trace
     data = json.loads(msg.payload)
+    path_trace = Tracer.extract(data)
     new_path = data.get('path_xy', [])
     path_xy  = new_path
     current_index = 0
@@ -58,6 +69,7 @@ def on_odometry(msg):
 def main():
     global path_xy, current_index, state
     client = mqtt.Client()
+    tracer.client = client
     client.on_message = on_message
     client.connect(MQTT_BROKER, MQTT_PORT, keepalive=60)
     client.subscribe(MQTT_TOPIC_PATH_PLAN)
@@ -69,15 +81,15 @@ def main():
             time.sleep(0.1)
 
             if not path_xy or state == 'IDLE':
-                # Send zero command
-                cmd = {'linear_velocity': 0.0, 'angular_velocity': 0.0}
+                # Send zero command (a root trace, nothing caused it)
+                cmd = tracer.stamp({'linear_velocity': 0.0, 'angular_velocity': 0.0})
                 client.publish(MQTT_TOPIC_DRIVE_CMD, json.dumps(cmd))
                 continue
 
             if current_index >= len(path_xy):
                 # Path completed
                 print("[node_drivepath.py] Path done => sending path_completed.")
-                client.publish(MQTT_TOPIC_PATH_DONE, json.dumps({'status': 'completed'}))
+                client.publish(MQTT_TOPIC_PATH_DONE, json.dumps(tracer.stamp({'status': 'completed'}, path_trace)))
                 path_xy = []
                 state = 'IDLE'
                 continue
@@ -107,7 +119,7 @@ def main():
                     # Rotate in place
                     ang_vel = K_ANGULAR * angle_error
                     ang_vel = max(-MAX_ANGULAR_SPEED, min(MAX_ANGULAR_SPEED, ang_vel))
-                    cmd = {'linear_velocity': 0.0, 'angular_velocity': ang_vel}
+                    cmd = tracer.stamp({'linear_velocity': 0.0, 'angular_velocity': ang_vel}, path_trace)
                     client.publish(MQTT_TOPIC_DRIVE_CMD, json.dumps(cmd))
 
             elif state == 'DRIVING':
@@ -116,16 +128,16 @@ def main():
                 ang_vel = K_ANGULAR_DRIVE * angle_error
                 ang_vel = max(-MAX_ANGULAR_SPEED, min(MAX_ANGULAR_SPEED, ang_vel))
 
-                cmd = {
+                cmd = tracer.stamp({
                     'linear_velocity': lin_vel,
                     'angular_velocity': ang_vel
-                }
+                }, path_trace)
                 client.publish(MQTT_TOPIC_DRIVE_CMD, json.dumps(cmd))
 
     except KeyboardInterrupt:
         print("\n[node_drivepath.py] Interrupted.")
     finally:
-        cmd_msg = {'linear_velocity': 0.0, 'angular_velocity': 0.0}
+        cmd_msg = tracer.stamp({'linear_velocity': 0.0, 'angular_velocity': 0.0})
         client.publish(MQTT_TOPIC_DRIVE_CMD, json.dumps(cmd_msg))
         client.loop_stop()
         client.disconnect()
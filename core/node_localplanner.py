@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+
+# Adds the lib directory to the Python path
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import json
+import time
+import math
+import numpy as np
+import paho.mqtt.client as mqtt
+from lib.tracing import Tracer
+
+# Drop-in replacement for node_drivepath.py: both follow robot/local_path and
+# publish robot/drive, so run one or the other, never both. Commands are only
+# published while following a path (plus a single stop when it ends), so an
+# idle planner never overrides node_wasd.py or direct_control.py.
+
+# -----------------------------------------------------------------------------
+# MQTT Setup
+# -----------------------------------------------------------------------------
+MQTT_BROKER             = "localhost"
+MQTT_PORT               = 1883
+MQTT_TOPIC_PATH_PLAN    = "robot/local_path"
+MQTT_TOPIC_DRIVE_CMD    = "robot/drive"
+MQTT_TOPIC_ODOMETRY     = "robot/odometry"
+MQTT_TOPIC_OCC_GRID     = "robot/tof_map"
+MQTT_TOPIC_PATH_DONE    = "robot/path_completed"
+
+# -----------------------------------------------------------------------------
+# Dynamic Window Parameters
+# -----------------------------------------------------------------------------
+CONTROL_RATE       = 20     # Hz
+MAX_LINEAR_SPEED   = 0.3    # m/s (node_drivepath.py uses 0.12 with no obstacle checks)
+MAX_ANGULAR_SPEED  = 0.8    # rad/s
+MAX_LINEAR_ACCEL   = 0.5    # m/s^2
+MAX_ANGULAR_ACCEL  = 2.0    # rad/s^2
+NUM_V_SAMPLES      = 11
+NUM_W_SAMPLES      = 21
+SIM_HORIZON        = 1.5    # seconds of forward simulation per sample
+SIM_DT             = 0.1    # seconds per rollout step
+
+# Scoring weights
+W_PROGRESS         = 1.0
+W_CLEARANCE        = 0.4
+W_SMOOTHNESS       = 0.1
+W_SPEED            = 0.2
+MAX_CLEARANCE      = 0.5    # meters, clearance beyond this scores the same
+
+DISTANCE_THRESHOLD = 0.1    # 10 cm
+ANGLE_THRESHOLD    = 0.2    # ~11.5 deg, rotate in place when facing further away
+
+# -----------------------------------------------------------------------------
+# Globals
+# -----------------------------------------------------------------------------
+path_xy         = []
+current_index   = 0
+robot_x         = 0.0
+robot_y         = 0.0
+robot_th        = 0.0  # Radians
+clearance_map   = None # Meters to the nearest occupied cell, robot frame
+grid_params     = {}
+grid_trace      = None # Trace of the grid message the clearance map came from
+last_v          = 0.0
+last_w          = 0.0
+tracer          = Tracer("node_localplanner")
+
+def wrap_angle(angle):
+    return (angle + math.pi) % (2.0 * math.pi) - math.pi
+
+# -----------------------------------------------------------------------------
+# MQTT Callbacks
+# -----------------------------------------------------------------------------
+def on_message(client, userdata, msg):
+    if msg.topic == MQTT_TOPIC_PATH_PLAN:
+        on_path_plan(msg)
+    elif msg.topic == MQTT_TOPIC_ODOMETRY:
+        on_odometry(msg)
+    elif msg.topic == MQTT_TOPIC_OCC_GRID:
+        on_occupancy_grid(msg)
+
+def on_path_plan(msg):
+    global path_xy, current_index
+    data = json.loads(msg.payload)
+    path_xy = data.get('path_xy', [])
+    current_index = 0
+    if path_xy:
+        print(f"[node_localplanner.py] New path with {len(path_xy)} waypoints => starting from 0")
+
+def on_odometry(msg):
+    global robot_x, robot_y, robot_th
+    data = json.loads(msg.payload)
+    robot_x  = data.get('x', robot_x)
+    robot_y  = data.get('y', robot_y)
+    robot_th = data.get('theta', 0.0)  # radians
+
+def on_occupancy_grid(msg):
+    global clearance_map, grid_params, grid_trace
+    payload = json.loads(msg.payload)
+    if "occupancy_grid" not in payload:
+        return
+    grid_trace = Tracer.extract(payload)
+    grid_info = payload["occupancy_grid"]
+    grid = np.array(grid_info["data"], dtype=np.uint8).reshape((grid_info["height"], grid_info["width"]))
+    params = {
+        "resolution": grid_info["resolution"],
+        "min_x":      grid_info["min_x"],
+        "min_y":      grid_info["min_y"],
+    }
+    # Swap both at once so the control loop never sees a mismatched pair
+    clearance_map, grid_params = compute_clearance(grid, params["resolution"]), params
+
+# -----------------------------------------------------------------------------
+# Clearance Map
+# -----------------------------------------------------------------------------
+def compute_clearance(grid, resolution):
+    """
+    Approximate distance (meters) from every cell to the nearest occupied cell
+    (grid == 0, already inflated by the robot radius in node_map.py).
+
+    Uses repeated 8-neighbour dilation, capped at MAX_CLEARANCE, so the cost is
+    a handful of whole-array operations per grid update instead of per cell.
+    """
+    max_steps = int(math.ceil(MAX_CLEARANCE / resolution))
+    clearance = np.full(grid.shape, max_steps, dtype=np.float32)
+    reached = grid == 0
+    clearance[reached] = 0
+    for step in range(1, max_steps):
+        grown = reached.copy()
+        grown[1:, :]  |= reached[:-1, :]
+        grown[:-1, :] |= reached[1:, :]
+        grown[:, 1:]  |= reached[:, :-1]
+        grown[:, :-1] |= reached[:, 1:]
+        grown[1:, 1:]   |= reached[:-1, :-1]
+        grown[1:, :-1]  |= reached[:-1, 1:]
+        grown[:-1, 1:]  |= reached[1:, :-1]
+        grown[:-1, :-1] |= reached[1:, 1:]
+        clearance[grown & ~reached] = step
+        reached = grown
+    return clearance * resolution
+
+# -----------------------------------------------------------------------------
+# Dynamic Window Approach
+# -----------------------------------------------------------------------------
+STEPS = int(round(SIM_HORIZON / SIM_DT))
+STEP_TIMES = np.arange(1, STEPS + 1, dtype=np.float32) * SIM_DT  # (T,)
+
+def sample_window(v0, w0):
+    """All (v, w) pairs reachable within one control period, as flat arrays."""
+    dt = 1.0 / CONTROL_RATE
+    v_lo = max(0.0, v0 - MAX_LINEAR_ACCEL * dt)
+    v_hi = min(MAX_LINEAR_SPEED, v0 + MAX_LINEAR_ACCEL * dt)
+    w_lo = max(-MAX_ANGULAR_SPEED, w0 - MAX_ANGULAR_ACCEL * dt)
+    w_hi = min(MAX_ANGULAR_SPEED, w0 + MAX_ANGULAR_ACCEL * dt)
+    vs, ws = np.meshgrid(
+        np.linspace(v_lo, v_hi, NUM_V_SAMPLES, dtype=np.float32),
+        np.linspace(w_lo, w_hi, NUM_W_SAMPLES, dtype=np.float32),
+    )
+    return vs.ravel(), ws.ravel()
+
+def rollout(vs, ws):
+    """
+    Forward-simulate constant (v, w) commands from the robot origin.
+    Returns x, y, theta arrays of shape (N, T) in the robot frame.
+    """
+    theta = ws[:, None] * STEP_TIMES[None, :]
+    x = np.cumsum(vs[:, None] * np.cos(theta) * SIM_DT, axis=1)
+    y = np.cumsum(vs[:, None] * np.sin(theta) * SIM_DT, axis=1)
+    return x, y, theta
+
+def lookup_clearance(xs, ys):
+    """Clearance for robot-frame points; cells outside the map count as open."""
+    if clearance_map is None:
+        return np.full(xs.shape, MAX_CLEARANCE, dtype=np.float32)
+    res = grid_params["resolution"]
+    cols = ((xs - grid_params["min_x"]) / res).astype(np.int32)
+    rows = ((ys - grid_params["min_y"]) / res).astype(np.int32)
+    h, w = clearance_map.shape
+    inside = (rows >= 0) & (rows < h) & (cols >= 0) & (cols < w)
+    out = np.full(xs.shape, MAX_CLEARANCE, dtype=np.float32)
+    out[inside] = clearance_map[rows[inside], cols[inside]]
+    return out
+
+def normalize(score):
+    span = score.max() - score.min()
+    if span < 1e-9:
+        return np.zeros_like(score)
+    return (score - score.min()) / span
+
+def choose_command(goal_local):
+    """Score every sampled trajectory and return the best admissible (v, w)."""
+    vs, ws = sample_window(last_v, last_w)
+    xs, ys, ths = rollout(vs, ws)
+
+    clearance = lookup_clearance(xs, ys).min(axis=1)
+    admissible = clearance > 0.0
+    if not np.any(admissible):
+        return None
+
+    gx, gy = goal_local
+    end_dist = np.hypot(gx - xs[:, -1], gy - ys[:, -1])
+    bearing = np.arctan2(gy - ys[:, -1], gx - xs[:, -1]) - ths[:, -1]
+    end_heading = np.abs(np.arctan2(np.sin(bearing), np.cos(bearing)))
+    progress   = -(end_dist + 0.1 * end_heading)
+    smoothness = -(np.abs(vs - last_v) + np.abs(ws - last_w))
+
+    score = (W_PROGRESS * normalize(progress)
+             + W_CLEARANCE * normalize(clearance)
+             + W_SMOOTHNESS * normalize(smoothness)
+             + W_SPEED * normalize(vs))
+    score[~admissible] = -np.inf
+
+    best = int(np.argmax(score))
+    return float(vs[best]), float(ws[best])
+
+def ramp(current, target, max_step):
+    """Move current towards target by at most max_step."""
+    return current + max(-max_step, min(max_step, target - current))
+
+def goal_in_robot_frame(gx, gy):
+    dx = gx - robot_x
+    dy = gy - robot_y
+    c = math.cos(-robot_th)
+    s = math.sin(-robot_th)
+    return (c * dx - s * dy, s * dx + c * dy)
+
+def publish_cmd(client, lin_vel, ang_vel, parent=None):
+    global last_v, last_w
+    last_v, last_w = lin_vel, ang_vel
+    # Commands not derived from a traced input start a new (root) trace
+    cmd = tracer.stamp({'linear_velocity': lin_vel, 'angular_velocity': ang_vel}, parent)
+    client.publish(MQTT_TOPIC_DRIVE_CMD, json.dumps(cmd))
+
+# -----------------------------------------------------------------------------
+# Main Loop
+# -----------------------------------------------------------------------------
+def main():
+    global path_xy, current_index
+    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+    tracer.client = client
+    client.on_message = on_message
+    client.connect(MQTT_BROKER, MQTT_PORT, keepalive=60)
+    client.subscribe(MQTT_TOPIC_PATH_PLAN)
+    client.subscribe(MQTT_TOPIC_ODOMETRY)
+    client.subscribe(MQTT_TOPIC_OCC_GRID)
+    client.loop_start()
+
+    period = 1.0 / CONTROL_RATE
+    next_tick = time.monotonic()
+
+    try:
+        while True:
+            next_tick += period
+            time.sleep(max(0.0, next_tick - time.monotonic()))
+
+            if not path_xy:
+                # Idle: stop once if a path was abandoned mid-motion, then stay quiet
+                if last_v != 0.0 or last_w != 0.0:
+                    publish_cmd(client, 0.0, 0.0)
+                continue
+
+            if current_index >= len(path_xy):
+                print("[node_localplanner.py] Path done => sending path_completed.")
+                client.publish(MQTT_TOPIC_PATH_DONE, json.dumps(tracer.stamp({'status': 'completed'})))
+                path_xy = []
+                publish_cmd(client, 0.0, 0.0)
+                continue
+
+            gx, gy = goal_in_robot_frame(*path_xy[current_index])
+            if math.hypot(gx, gy) < DISTANCE_THRESHOLD:
+                current_index += 1
+                continue
+
+            # Turn in place towards waypoints behind us; DWA only samples v >= 0
+            angle_error = math.atan2(gy, gx)
+            # (within the same acceleration limits as the dynamic window)
+            if abs(angle_error) > math.pi / 2 + ANGLE_THRESHOLD:
+                lin_vel = ramp(last_v, 0.0, MAX_LINEAR_ACCEL * period)
+                ang_vel = ramp(last_w, math.copysign(MAX_ANGULAR_SPEED, angle_error), MAX_ANGULAR_ACCEL * period)
+                publish_cmd(client, lin_vel, ang_vel)
+                continue
+
+            parent_trace = grid_trace
+            with tracer.span("choose_command", parent_trace):
+                cmd = choose_command((gx, gy))
+            if cmd is None:
+                print("[node_localplanner.py] No admissible trajectory => stopping.")
+                publish_cmd(client, 0.0, 0.0, parent_trace)
+                continue
+            publish_cmd(client, *cmd, parent_trace)
+
+    except KeyboardInterrupt:
+        print("\n[node_localplanner.py] Interrupted.")
+    finally:
+        publish_cmd(client, 0.0, 0.0)
+        client.loop_stop()
+        client.disconnect()
+        print("[node_localplanner.py] Shutdown complete.")
+
+if __name__ == "__main__":
+    main()
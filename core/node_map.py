@@ -13,16 +13,23 @@ import numpy as np
 from typing import List, Dict
 import base64
 
-from RPi import GPIO
-import smbus2
 import paho.mqtt.client as mqtt
 
-# VL53L5CX libraries
-from lib.vl53l5cx_lib.vl53l5cx import VL53L5CX
+# Set STUFFBOT_SIM=host:port to read simulated sensors from core/node_sim.py
+SIM_ENDPOINT = os.getenv("STUFFBOT_SIM")
+if SIM_ENDPOINT:
+    from lib.sim_world import SimGPIO as GPIO, SimVL53L5CX as VL53L5CX, SIM_SENSOR_ADDRESSES
+else:
+    from RPi import GPIO
+    import smbus2
+
+    # VL53L5CX libraries
+    from lib.vl53l5cx_lib.vl53l5cx import VL53L5CX
 from lib.vl53l5cx_lib.api import (
     VL53L5CX_RESOLUTION_4X4,
     VL53L5CX_RESOLUTION_8X8
 )
+from lib.tracing import Tracer
 
 # -----------------------------------------------------------------------------
 # MQTT Setup
@@ -34,6 +41,7 @@ MQTT_TOPIC = "robot/tof_map"  # Publish the map data here
 client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)  # Update to use VERSION2 callbacks
 client.connect(MQTT_BROKER, MQTT_PORT, keepalive=60)
 client.loop_start()
+tracer = Tracer("node_map", client)
 
 # -----------------------------------------------------------------------------
 # Sensor Data Cache
@@ -53,6 +61,8 @@ for pin in sensor_pins:
     GPIO.setup(pin, GPIO.OUT)
 
 def scan_i2c_bus(bus_number=1):
+    if SIM_ENDPOINT:
+        return list(SIM_SENSOR_ADDRESSES)
     bus = smbus2.SMBus(bus_number)
     devices = []
     for address in range(128):
@@ -329,13 +339,14 @@ try:
             ]
 
             # Create occupancy grid from combined data
-            occupancy_grid = update_occupancy_grid(combined_sensor_data)
+            with tracer.span("update_grid"):
+                occupancy_grid = update_occupancy_grid(combined_sensor_data)
             
             # Convert numpy array to list for JSON serialization
             grid_list = occupancy_grid.tolist()
             
             # Add grid to payload
-            payload = json.dumps({
+            payload = json.dumps(tracer.stamp({
                 "sensors": combined_sensor_data,  # Send all cached sensor data
                 "occupancy_grid": {
                     "data": grid_list,
@@ -347,7 +358,7 @@ try:
                     "min_y": GRID_MIN_Y,
                     "max_y": GRID_MAX_Y
                 }
-            })
+            }))
             client.publish(MQTT_TOPIC, payload)
 
         time.sleep(0.05)
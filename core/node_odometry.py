@@ -11,6 +11,7 @@ import paho.mqtt.client as mqtt
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 from lib.odrive_uart import ODriveUART
+from lib.tracing import Tracer
 
 # ------------------------------------------------------------------------------------
 # Constants
@@ -22,6 +23,11 @@ MQTT_TOPIC_RESET_ODOMETRY = "robot/reset_odometry"  # New topic
 # ODrive UART port
 ODRIVE_UART_PORT = '/dev/ttyAMA1'  # Adjust as necessary
 
+# Set STUFFBOT_SIM=host:port to talk to core/node_sim.py instead of the ODrive
+SIM_ENDPOINT = os.getenv("STUFFBOT_SIM")
+if SIM_ENDPOINT:
+    ODRIVE_UART_PORT = f"socket://{SIM_ENDPOINT}"
+
 # Robot parameters
 WHEEL_RADIUS = 0.0825   # meters (adjust based on your robot's wheel radius)
 WHEEL_BASE = 0.420      # meters (track width is 400mm)
@@ -29,14 +35,19 @@ WHEEL_BASE = 0.420      # meters (track width is 400mm)
 # ------------------------------------------------------------------------------------
 # Initialize ODrive
 # ------------------------------------------------------------------------------------
-try:
-    # Load motor directions from JSON file
-    with open(os.path.expanduser('~/quickstart/lib/motor_dir.json'), 'r') as f:
-        motor_dirs = json.load(f)
-        left_dir = motor_dirs['left']
-        right_dir = motor_dirs['right']
-except Exception as e:
-    raise Exception("Error reading motor_dir.json") from e
+if SIM_ENDPOINT:
+    # Simulated wheels are both forward-positive
+    left_dir = 1
+    right_dir = 1
+else:
+    try:
+        # Load motor directions from JSON file
+        with open(os.path.expanduser('~/quickstart/lib/motor_dir.json'), 'r') as f:
+            motor_dirs = json.load(f)
+            left_dir = motor_dirs['left']
+            right_dir = motor_dirs['right']
+    except Exception as e:
+        raise Exception("Error reading motor_dir.json") from e
 
 # Initialize the motor controller
 motor_controller = ODriveUART(
@@ -81,6 +92,7 @@ def main():
 
     # Initialize MQTT client
     client = mqtt.Client()
+    tracer = Tracer("node_odometry", client)
     client.on_message = on_message
     client.connect(MQTT_BROKER_ADDRESS)
     client.loop_start()
@@ -146,11 +158,11 @@ def main():
 
             # Publish odometry data at 5 Hz
             if current_time - last_publish_time >= publish_interval:
-                odom_msg = {
+                odom_msg = tracer.stamp({
                     'x': x,
                     'y': y,
                     'theta': theta
-                }
+                })
                 client.publish(MQTT_TOPIC_ODOMETRY, json.dumps(odom_msg))
                 print(f"Published odometry data: {odom_msg}")
                 last_publish_time = current_time  # Reset last publish time
@@ -1,5 +1,10 @@
 #!/usr/bin/env python3
 
+# Adds the lib directory to the Python path
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
 import json
 import time
 import math
@@ -7,6 +12,7 @@ import random
 import numpy as np
 import paho.mqtt.client as mqtt
 from heapq import heappush, heappop
+from lib.tracing import Tracer
 
 # -----------------------------------------------------------------------------
 # MQTT Setup
@@ -23,10 +29,12 @@ MQTT_TOPIC_ODOMETRY       = "robot/odometry"
 client = mqtt.Client()
 client.connect(MQTT_BROKER, MQTT_PORT, keepalive=60)
 client.loop_start()
+tracer = Tracer("node_pathplanning", client)
 
 # Global
 occupancy_grid = None
 grid_params    = {}
+grid_trace     = None  # Trace of the grid message the current grid came from
 current_path   = None
 need_new_path  = True
 robot_x        = 0.0
@@ -45,10 +53,11 @@ def on_message(client, userdata, message):
         on_odometry(message)
 
 def on_occupancy_grid(message):
-    global occupancy_grid, grid_params
+    global occupancy_grid, grid_params, grid_trace
     payload = json.loads(message.payload)
     if "occupancy_grid" not in payload:
         return
+    grid_trace = Tracer.extract(payload)
     grid_info = payload["occupancy_grid"]
     data_flat = grid_info["data"]
     h = grid_info["height"]
@@ -221,26 +230,28 @@ def main():
 
         if need_new_path or current_path is None:
             print("[node_pathplanning.py] Planning a new path...")
+            parent_trace = grid_trace
 
             # Try a random heading or just use robot heading
-            path_rc = pick_random_free_cell_in_front(
-                occupancy_grid, grid_params,
-                rr, cc,
-                robot_x, robot_y, robot_th_deg,
-                distance_m=1.0,
-                fov_half_deg=90.0,
-                side_margin_deg=5.0,
-                max_tries=30
-            )
+            with tracer.span("plan", parent_trace):
+                path_rc = pick_random_free_cell_in_front(
+                    occupancy_grid, grid_params,
+                    rr, cc,
+                    robot_x, robot_y, robot_th_deg,
+                    distance_m=1.0,
+                    fov_half_deg=90.0,
+                    side_margin_deg=5.0,
+                    max_tries=30
+                )
 
             if path_rc is not None:
                 path_rc = simplify_path(path_rc, 4)
                 path_xy = [grid_to_world(r, c, grid_params) for r, c in path_rc]
 
-                msg = {
+                msg = tracer.stamp({
                     "path_rc": path_rc,
                     "path_xy": path_xy
-                }
+                }, parent_trace)
                 client.publish(MQTT_TOPIC_PATH_PLAN, json.dumps(msg))
                 current_path = path_rc
                 need_new_path = False
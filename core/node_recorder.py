@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+# Adds the lib directory to the Python path
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import time
+import threading
+from datetime import datetime
+import paho.mqtt.client as mqtt
+from lib.mqtt_log import LogWriter
+
+# -----------------------------------------------------------------------------
+# Constants
+# -----------------------------------------------------------------------------
+MQTT_BROKER = "localhost"
+MQTT_PORT = 1883
+MQTT_TOPIC = "robot/#"            # Record every robot topic
+
+LOG_DIR = os.path.expanduser("~/stuffbot_logs")
+CHUNK_SECONDS = 1.0               # Flush a chunk at least this often
+CHUNK_MAX_BYTES = 4 * 1024 * 1024 # ...or once this much payload is buffered
+
+# -----------------------------------------------------------------------------
+# Buffered Records
+# -----------------------------------------------------------------------------
+buffer_lock = threading.Lock()
+buffered_records = []
+buffered_bytes = 0
+total_records = 0
+
+def on_connect(client, userdata, flags, reason_code, properties=None):
+    print(f"[node_recorder.py] Connected with reason code: {reason_code}")
+    client.subscribe(MQTT_TOPIC)
+
+def on_message(client, userdata, msg):
+    global buffered_bytes
+    # Timestamp on arrival; the MQTT thread does nothing else
+    record = (time.monotonic(), msg.topic, msg.payload)
+    with buffer_lock:
+        buffered_records.append(record)
+        buffered_bytes += len(msg.payload)
+
+def take_buffer():
+    global buffered_records, buffered_bytes
+    with buffer_lock:
+        records = buffered_records
+        buffered_records = []
+        buffered_bytes = 0
+    return records
+
+def main():
+    global total_records
+    os.makedirs(LOG_DIR, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    log_path = os.path.join(LOG_DIR, f"run_{timestamp}.sblog")
+    writer = LogWriter(log_path, time.time(), time.monotonic())
+
+    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+    client.on_connect = on_connect
+    client.on_message = on_message
+    client.connect(MQTT_BROKER, MQTT_PORT, keepalive=60)
+    client.loop_start()
+    print(f"[node_recorder.py] Recording {MQTT_TOPIC} to {log_path}")
+
+    last_flush = time.monotonic()
+    try:
+        while True:
+            time.sleep(0.05)
+            now = time.monotonic()
+            if now - last_flush < CHUNK_SECONDS and buffered_bytes < CHUNK_MAX_BYTES:
+                continue
+            records = take_buffer()
+            writer.write_chunk(records)
+            total_records += len(records)
+            last_flush = now
+
+    except KeyboardInterrupt:
+        print("\n[node_recorder.py] Interrupted.")
+    finally:
+        client.loop_stop()
+        client.disconnect()
+        records = take_buffer()
+        writer.write_chunk(records)
+        total_records += len(records)
+        writer.close()
+        print(f"[node_recorder.py] Wrote {total_records} messages to {log_path}")
+
+if __name__ == "__main__":
+    main()
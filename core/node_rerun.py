@@ -7,6 +7,9 @@ import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 import json
+import time
+import threading
+from collections import deque
 import numpy as np
 import paho.mqtt.client as mqtt
 import matplotlib
@@ -30,11 +33,27 @@ MQTT_TOPIC = "robot/tof_map"         # Subscribe to the map data topic
 PATH_PLAN_TOPIC = "robot/local_path"  # Subscribe to the path plan topic
 ODOMETRY_TOPIC = "robot/odometry"     # Subscribe to the odometry data
 
+# -----------------------------------------------------------------------------
+# Render Loop Setup
+# -----------------------------------------------------------------------------
+# MQTT callbacks only stash the newest payload per topic; a worker thread
+# renders at most RENDER_RATE times per second, so a slow viewer connection
+# never backs up the MQTT network thread.
+RENDER_RATE = 10  # Hz
+
+# Render odometry first so the occupancy grid uses the freshest pose
+RENDER_ORDER = [ODOMETRY_TOPIC, PATH_PLAN_TOPIC, MQTT_TOPIC]
+
 # -----------------------------------------------------------------------------
 # Color Mapping Setup
 # -----------------------------------------------------------------------------
 cmap = matplotlib.colormaps["coolwarm"]  # Use a colormap that transitions from blue to red
-norm = matplotlib.colors.Normalize(vmin=0.0, vmax=4.0)  # 0–4 meters color range
+COLOR_MAX_DIST = 4.0  # 0–4 meters color range
+COLOR_LUT = (cmap(np.linspace(0.0, 1.0, 256)) * 255).astype(np.uint8)  # 256 RGBA entries
+
+INVALID_POINT_COLOR = [1.0, 1.0, 0.0, 0.5]  # Yellow, semi-transparent
+OCCUPIED_CELL_COLOR = [0.2, 0.2, 0.2, 1.0]  # Dark gray, fully opaque
+TOF_POINT_RADIUS    = 0.05
 
 # -----------------------------------------------------------------------------
 # Logging a Simple Robot Box (Timeless)
@@ -42,12 +61,30 @@ norm = matplotlib.colors.Normalize(vmin=0.0, vmax=4.0)  # 0–4 meters color ran
 robot_half_size = np.array([[0.02, 0.02, 0.7]])   # half extents in x,y,z
 robot_color     = np.array([[1.0, 0.0, 0.0, 0.4]])# RGBA: red, semi-transparent
 
+# -----------------------------------------------------------------------------
+# Robot Path Logging
+# -----------------------------------------------------------------------------
+# The path is split into fixed-size chunks, each logged to its own entity.
+# Only the open chunk is re-sent on a new pose, and chunks older than
+# PATH_MAX_CHUNKS are cleared, so bandwidth and memory stay bounded on long runs.
+PATH_MIN_SPACING = 0.02   # meters between stored path points
+PATH_CHUNK_SIZE  = 50     # points per logged path chunk
+PATH_MAX_CHUNKS  = 40     # chunks kept in the viewer (~40 m of path at 2 cm spacing)
+
 # -----------------------------------------------------------------------------
 # Global Variables to Store Robot Path and Pose
 # -----------------------------------------------------------------------------
-robot_path = []  # List to store robot positions over time
+path_chunk = deque(maxlen=PATH_CHUNK_SIZE)  # Points in the currently open chunk
+path_chunk_index = 0                        # Entity index of the open chunk
 robot_pose = {'x': 0.0, 'y': 0.0, 'theta': 0.0}  # Robot's current pose
 
+# -----------------------------------------------------------------------------
+# Latest Message Per Topic
+# -----------------------------------------------------------------------------
+pending_lock = threading.Lock()
+pending_messages = {}            # topic -> newest unrendered payload
+pending_event = threading.Event()
+
 # -----------------------------------------------------------------------------
 # MQTT Callbacks
 # -----------------------------------------------------------------------------
@@ -60,166 +97,213 @@ def on_connect(client, userdata, flags, reason_code, properties=None):
     ])
 
 def on_message(client, userdata, msg):
-    try:
-        if msg.topic == MQTT_TOPIC:
-            data = json.loads(msg.payload)
-            
-            # Process each sensor's data
-            for sensor_data in data["sensors"]:
-                sensor_addr = sensor_data["sensor_address"]
-                
-                # Process valid points
-                valid_points = sensor_data["valid_points"]
-                if valid_points:
-                    points_np = np.array(valid_points)
-                    d_m = np.linalg.norm(points_np, axis=1)  # distances in meters
-                    colors = cmap(norm(d_m))
-                    radii = np.full(points_np.shape[0], 0.05)
-                    
-                    # Log the points relative to the 'robot' frame
-                    rr.log(
-                        f"robot/tof/sensor_{sensor_addr}/valid",
-                        rr.Points3D(points_np, colors=colors, radii=radii),
-                        timeless=False,
-                    )
-                
-                # Process invalid points
-                invalid_points = sensor_data["invalid_points"]
-                if invalid_points:
-                    points_np = np.array(invalid_points)
-                    colors = np.full((points_np.shape[0], 4), [1.0, 1.0, 0.0, 0.5])  # Yellow, semi-transparent
-                    radii = np.full(points_np.shape[0], 0.05)
-                    
-                    # Log the points relative to the 'robot' frame
-                    rr.log(
-                        f"robot/tof/sensor_{sensor_addr}/invalid",
-                        rr.Points3D(points_np, colors=colors, radii=radii),
-                        timeless=False,
-                    )
-
-            # Add occupancy grid visualization
-            if "occupancy_grid" in data:
-                grid_info = data["occupancy_grid"]
-                grid = np.array(grid_info["data"])
-                resolution = grid_info["resolution"]
-                min_x = grid_info["min_x"]
-                min_y = grid_info["min_y"]
-                
-                # Create points for occupied cells (where grid == 0)
-                occupied_indices = np.argwhere(grid == 0)
-                
-                if occupied_indices.size > 0:
-                    # Convert grid indices to robot-local coordinates
-                    # Grid indices: row (y), col (x)
-                    local_x = occupied_indices[:, 1] * resolution + min_x + (resolution / 2)
-                    local_y = occupied_indices[:, 0] * resolution + min_y + (resolution / 2)
-                    local_z = np.full_like(local_x, 0.1)  # Points at 0.1m height
-                    
-                    # Stack into Nx3 array
-                    local_points = np.column_stack((local_x, local_y, local_z))
-                    
-                    # Transform points to world coordinates
-                    world_points = transform_robot_to_world(local_points, robot_pose)
-                    
-                    colors = np.full((len(world_points), 4), [0.2, 0.2, 0.2, 1.0])  # Dark gray, fully opaque
-                    radii = np.full(len(world_points), resolution / 2)  # Half the cell size
-                    
-                    # Log the occupancy grid in the 'world' frame
-                    rr.log(
-                        "world/occupancy_grid",
-                        rr.Points3D(world_points, colors=colors, radii=radii),
-                        timeless=False,
-                    )
-        elif msg.topic == PATH_PLAN_TOPIC:
-            # Parse the path plan message
-            path_data = json.loads(msg.payload)
-            path_xy = path_data["path_xy"]  # These are already in world coordinates
-            
-            # Convert path to numpy array for visualization
-            path_points = np.array([[x, y, 0.1] for x, y in path_xy])  # Set Z to 0.1m
-            
-            # Log the path plan in the world frame (not robot frame)
-            if len(path_points) > 1:
-                rr.log(
-                    "world/path_plan",  # Changed from "robot/path_plan" to "world/path_plan"
-                    rr.LineStrips3D(
-                        [path_points],
-                        colors=[[0.0, 1.0, 0.0, 1.0]],  # Green path
-                        radii=[0.02]
-                    ),
-                    timeless=False,
-                )
-                print(f"Visualized path with {len(path_points)} points")
-    
-        elif msg.topic == ODOMETRY_TOPIC:
-            # Process odometry data
-            odom_data = json.loads(msg.payload)
-            robot_pose['x'] = odom_data['x']
-            robot_pose['y'] = odom_data['y']
-            robot_pose['theta'] = odom_data['theta']
-    
-            # Update the robot's transform in Rerun
-            sin_theta_half = math.sin(robot_pose['theta'] / 2.0)
-            cos_theta_half = math.cos(robot_pose['theta'] / 2.0)
-            quat = rr.Quaternion(xyzw=[0.0, 0.0, sin_theta_half, cos_theta_half])
-    
-            # Log the transform from 'world' to 'robot'
+    # Older unrendered payloads for the same topic are simply replaced
+    with pending_lock:
+        pending_messages[msg.topic] = msg.payload
+    pending_event.set()
+
+# -----------------------------------------------------------------------------
+# Rendering
+# -----------------------------------------------------------------------------
+def render_loop(stop_event):
+    period = 1.0 / RENDER_RATE
+    while not stop_event.is_set():
+        if not pending_event.wait(timeout=0.5):
+            continue
+        start = time.monotonic()
+
+        with pending_lock:
+            batch = dict(pending_messages)
+            pending_messages.clear()
+            pending_event.clear()
+
+        for topic in RENDER_ORDER:
+            if topic not in batch:
+                continue
+            try:
+                render_message(topic, json.loads(batch[topic]))
+            except Exception as e:
+                print(f"Error processing message: {e}")
+
+        # Cap the render rate; anything arriving meanwhile is coalesced
+        time.sleep(max(0.0, period - (time.monotonic() - start)))
+
+def render_message(topic, data):
+    if topic == MQTT_TOPIC:
+        render_tof_map(data)
+    elif topic == PATH_PLAN_TOPIC:
+        render_path_plan(data)
+    elif topic == ODOMETRY_TOPIC:
+        render_odometry(data)
+
+def render_tof_map(data):
+    # Process each sensor's data
+    for sensor_data in data["sensors"]:
+        sensor_addr = sensor_data["sensor_address"]
+
+        # Process valid points
+        valid_points = sensor_data["valid_points"]
+        if valid_points:
+            points_np = np.array(valid_points)
+            d_m = np.linalg.norm(points_np, axis=1)  # distances in meters
+            lut_idx = np.clip(d_m * (255.0 / COLOR_MAX_DIST), 0, 255).astype(np.intp)
+            colors = COLOR_LUT[lut_idx]
+
+            # Log the points relative to the 'robot' frame
             rr.log(
-                "robot",
-                rr.Transform3D(
-                    translation=[robot_pose['x'], robot_pose['y'], 0.0],
-                    rotation=quat,
-                ),
+                f"robot/tof/sensor_{sensor_addr}/valid",
+                rr.Points3D(points_np, colors=colors, radii=TOF_POINT_RADIUS),
                 timeless=False,
             )
-    
-            # Log the robot's visualization (optional)
-            robot_center = np.array([[0.0, 0.0, 0.7]])  # Robot is at the origin of its own frame
-    
-            # Log the box shape
+
+        # Process invalid points
+        invalid_points = sensor_data["invalid_points"]
+        if invalid_points:
+            # Log the points relative to the 'robot' frame
             rr.log(
-                "robot/geometry/extrusion",
-                rr.Boxes3D(
-                    centers=robot_center,
-                    half_sizes=robot_half_size,
-                    colors=robot_color
-                ),
+                f"robot/tof/sensor_{sensor_addr}/invalid",
+                rr.Points3D(invalid_points, colors=INVALID_POINT_COLOR, radii=TOF_POINT_RADIUS),
                 timeless=False,
             )
-            
-            # Add capsule base
+
+    # Add occupancy grid visualization
+    if "occupancy_grid" in data:
+        grid_info = data["occupancy_grid"]
+        grid = np.array(grid_info["data"])
+        resolution = grid_info["resolution"]
+        min_x = grid_info["min_x"]
+        min_y = grid_info["min_y"]
+
+        # Create points for occupied cells (where grid == 0)
+        occupied_indices = np.argwhere(grid == 0)
+
+        if occupied_indices.size > 0:
+            # Convert grid indices to robot-local coordinates
+            # Grid indices: row (y), col (x)
+            local_points = np.empty((len(occupied_indices), 3))
+            local_points[:, 0] = occupied_indices[:, 1] * resolution + min_x + (resolution / 2)
+            local_points[:, 1] = occupied_indices[:, 0] * resolution + min_y + (resolution / 2)
+            local_points[:, 2] = 0.1  # Points at 0.1m height
+
+            # Transform points to world coordinates
+            world_points = transform_robot_to_world(local_points, robot_pose)
+
+            # Log the occupancy grid in the 'world' frame
             rr.log(
-                "robot/geometry/base",
-                rr.Boxes3D(
-                    centers=[[0.0, 0.0, 0.0825]],  # Center at base
-                    half_sizes=[[0.25, 0.25, 0.075]],  # Half width/length 0.5/2 = 0.25m, height 0.15/2 = 0.075m
-                    colors=robot_color
-                ),
+                "world/occupancy_grid",
+                rr.Points3D(world_points, colors=OCCUPIED_CELL_COLOR, radii=resolution / 2),  # Half the cell size
                 timeless=False,
             )
-            print(f"Updated robot position: x={robot_pose['x']:.2f}, y={robot_pose['y']:.2f}, theta={robot_pose['theta']:.2f}")
-    
-            # Append the current position to the robot path (in world frame)
-            robot_path.append([robot_pose['x'], robot_pose['y'], 0.05])  # Z-coordinate is consistent with robot_center
-    
-            # Log the robot's path as a LineStrips3D in world frame
-            if len(robot_path) > 1:
-                rr.log(
-                    "world/robot_path",
-                    rr.LineStrips3D(
-                        [np.array(robot_path)],
-                        colors=[[0.0, 0.0, 1.0, 1.0]],  # Blue color for the path
-                        radii=0.01
-                    ),
-                    timeless=False,
-                )
-    
-    except Exception as e:
-        print(f"Error processing message: {e}")
+
+def render_path_plan(path_data):
+    path_xy = path_data["path_xy"]  # These are already in world coordinates
+
+    # Convert path to numpy array for visualization
+    path_points = np.array([[x, y, 0.1] for x, y in path_xy])  # Set Z to 0.1m
+
+    # Log the path plan in the world frame (not robot frame)
+    if len(path_points) > 1:
+        rr.log(
+            "world/path_plan",  # Changed from "robot/path_plan" to "world/path_plan"
+            rr.LineStrips3D(
+                [path_points],
+                colors=[[0.0, 1.0, 0.0, 1.0]],  # Green path
+                radii=[0.02]
+            ),
+            timeless=False,
+        )
+        print(f"Visualized path with {len(path_points)} points")
+
+def render_odometry(odom_data):
+    robot_pose['x'] = odom_data['x']
+    robot_pose['y'] = odom_data['y']
+    robot_pose['theta'] = odom_data['theta']
+
+    # Update the robot's transform in Rerun
+    sin_theta_half = math.sin(robot_pose['theta'] / 2.0)
+    cos_theta_half = math.cos(robot_pose['theta'] / 2.0)
+    quat = rr.Quaternion(xyzw=[0.0, 0.0, sin_theta_half, cos_theta_half])
+
+    # Log the transform from 'world' to 'robot'
+    rr.log(
+        "robot",
+        rr.Transform3D(
+            translation=[robot_pose['x'], robot_pose['y'], 0.0],
+            rotation=quat,
+        ),
+        timeless=False,
+    )
+
+    # Extend the robot path (in world frame)
+    update_robot_path([robot_pose['x'], robot_pose['y'], 0.05])  # Z-coordinate is consistent with robot_center
 
 # -----------------------------------------------------------------------------
 # Helper Functions
 # -----------------------------------------------------------------------------
+def log_robot_geometry():
+    """
+    Log the robot body once. It lives under the 'robot' entity, so it follows
+    the odometry transform without being re-sent on every pose.
+    """
+    robot_center = np.array([[0.0, 0.0, 0.7]])  # Robot is at the origin of its own frame
+
+    # Log the box shape
+    rr.log(
+        "robot/geometry/extrusion",
+        rr.Boxes3D(
+            centers=robot_center,
+            half_sizes=robot_half_size,
+            colors=robot_color
+        ),
+        timeless=True,
+    )
+
+    # Add capsule base
+    rr.log(
+        "robot/geometry/base",
+        rr.Boxes3D(
+            centers=[[0.0, 0.0, 0.0825]],  # Center at base
+            half_sizes=[[0.25, 0.25, 0.075]],  # Half width/length 0.5/2 = 0.25m, height 0.15/2 = 0.075m
+            colors=robot_color
+        ),
+        timeless=True,
+    )
+
+def update_robot_path(point):
+    """
+    Append a pose to the robot path, skipping points closer than PATH_MIN_SPACING
+    to the last one, and log only the chunk that changed.
+    """
+    global path_chunk_index
+
+    if path_chunk and math.dist(path_chunk[-1], point) < PATH_MIN_SPACING:
+        return
+
+    if len(path_chunk) == PATH_CHUNK_SIZE:
+        # Close the full chunk and start the next one from its last point
+        last_point = path_chunk[-1]
+        path_chunk.clear()
+        path_chunk.append(last_point)
+        path_chunk_index += 1
+
+        # Drop the oldest chunk from the viewer once we are over budget
+        stale_index = path_chunk_index - PATH_MAX_CHUNKS
+        if stale_index >= 0:
+            rr.log(f"world/robot_path/chunk_{stale_index}", rr.Clear(recursive=False))
+
+    path_chunk.append(point)
+
+    if len(path_chunk) > 1:
+        rr.log(
+            f"world/robot_path/chunk_{path_chunk_index}",
+            rr.LineStrips3D(
+                [np.array(path_chunk)],
+                colors=[[0.0, 0.0, 1.0, 1.0]],  # Blue color for the path
+                radii=0.01
+            ),
+            timeless=False,
+        )
+
 def transform_robot_to_world(points, robot_pose):
     """
     Transform points from the robot frame to the world frame using the robot's pose.
@@ -252,6 +336,12 @@ def main():
     client.on_connect = on_connect
     client.on_message = on_message
 
+    log_robot_geometry()
+
+    stop_event = threading.Event()
+    render_thread = threading.Thread(target=render_loop, args=(stop_event,), daemon=True)
+    render_thread.start()
+
     try:
         client.connect(MQTT_BROKER, MQTT_PORT, 60)
         print("Starting MQTT loop...")
@@ -260,6 +350,8 @@ def main():
     except KeyboardInterrupt:
         print("\nInterrupted by user")
     finally:
+        stop_event.set()
+        render_thread.join(timeout=1.0)
         client.disconnect()
         print("MQTT disconnected. Exiting.")
 
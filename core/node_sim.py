@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+
+# Adds the lib directory to the Python path
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import json
+import time
+import threading
+import argparse
+import socketserver
+import paho.mqtt.client as mqtt
+from lib.sim_world import SimWorld, FakeODrive
+
+# -----------------------------------------------------------------------------
+# Constants
+# -----------------------------------------------------------------------------
+MQTT_BROKER = "localhost"
+MQTT_PORT = 1883
+MQTT_TOPIC_SIM_POSE = "robot/sim_pose"  # Ground-truth pose, for checking odometry
+
+SIM_HOST = "localhost"
+SIM_PORT = 9870
+PHYSICS_RATE = 200       # Simulation steps per simulated second
+POSE_PUBLISH_RATE = 10   # Hz, wall clock
+
+class ODriveHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for raw in self.rfile:
+            response = self.server.odrive.handle(raw.decode('ascii', errors='ignore').strip())
+            if response is not None:
+                self.wfile.write(f"{response}\n".encode())
+
+class SimServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+def physics_loop(world, lock, time_scale, stop_event):
+    """
+    Step the world at PHYSICS_RATE simulated Hz. With time_scale > 1 the
+    world runs faster than real time; with time_scale <= 0 it steps as fast
+    as the CPU allows.
+    """
+    dt = 1.0 / PHYSICS_RATE
+    next_tick = time.monotonic()
+    while not stop_event.is_set():
+        with lock:
+            world.step(dt)
+        if time_scale > 0:
+            next_tick += dt / time_scale
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        else:
+            # Give the socket threads a chance to grab the lock
+            time.sleep(0)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Simulated ODrive + VL53L5CX endpoint for the core nodes")
+    parser.add_argument("--port", type=int, default=SIM_PORT)
+    parser.add_argument("--time-scale", type=float, default=1.0,
+                        help="Simulated seconds per wall second, 0 for as fast as possible (default: 1.0)")
+    parser.add_argument("--seed", type=int, default=None)
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    world = SimWorld(seed=args.seed)
+    lock = threading.Lock()
+
+    server = SimServer((SIM_HOST, args.port), ODriveHandler)
+    server.odrive = FakeODrive(world, lock)
+    server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+    server_thread.start()
+
+    stop_event = threading.Event()
+    physics_thread = threading.Thread(target=physics_loop, args=(world, lock, args.time_scale, stop_event), daemon=True)
+    physics_thread.start()
+
+    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+    client.connect(MQTT_BROKER, MQTT_PORT, keepalive=60)
+    client.loop_start()
+
+    print(f"[node_sim.py] Listening on {SIM_HOST}:{args.port}, time scale {args.time_scale}")
+    print(f"[node_sim.py] Run the core nodes with STUFFBOT_SIM={SIM_HOST}:{args.port}")
+
+    try:
+        while True:
+            time.sleep(1.0 / POSE_PUBLISH_RATE)
+            with lock:
+                pose = {'x': world.x, 'y': world.y, 'theta': world.theta, 'sim_time': world.sim_time}
+            client.publish(MQTT_TOPIC_SIM_POSE, json.dumps(pose))
+
+    except KeyboardInterrupt:
+        print("\n[node_sim.py] Interrupted.")
+    finally:
+        stop_event.set()
+        server.shutdown()
+        client.loop_stop()
+        client.disconnect()
+        print("[node_sim.py] Shutdown complete.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+
+# Adds the lib directory to the Python path
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import json
+import time
+import threading
+from collections import OrderedDict, defaultdict
+from datetime import datetime
+import paho.mqtt.client as mqtt
+from lib.tracing import TRACE_KEY, TRACE_TOPIC, LatencyHistogram
+
+# -----------------------------------------------------------------------------
+# Constants
+# -----------------------------------------------------------------------------
+MQTT_BROKER = "localhost"
+MQTT_PORT = 1883
+MQTT_TOPIC = "robot/#"
+
+LOG_DIR = os.path.expanduser("~/stuffbot_logs")
+EXPORT_INTERVAL = 10.0   # seconds between summary exports
+MAX_KNOWN_MESSAGES = 10000
+
+# -----------------------------------------------------------------------------
+# Collected Latencies
+# -----------------------------------------------------------------------------
+# "transport <topic>"       publish -> arrival here
+# "hop <parent> -> <node>"  parent publish -> child publish (includes processing)
+# "span <node>.<name>"      processing time reported by the node
+# "e2e <origin> -> <node>"  origin of the causal chain -> end of the final span
+stats_lock = threading.Lock()
+histograms = defaultdict(LatencyHistogram)
+known_messages = OrderedDict()  # trace id -> trace dict, bounded
+
+def record(key, seconds):
+    with stats_lock:
+        histograms[key].add(seconds * 1000.0)
+
+def origin_node(trace):
+    """Walk the parent links we have seen back to the first message."""
+    node = trace["node"]
+    parent = trace.get("parent")
+    while parent in known_messages:
+        node = known_messages[parent]["node"]
+        parent = known_messages[parent].get("parent")
+    return node
+
+def on_connect(client, userdata, flags, reason_code, properties=None):
+    print(f"[node_trace.py] Connected with reason code: {reason_code}")
+    client.subscribe(MQTT_TOPIC)
+
+def on_message(client, userdata, msg):
+    arrival = time.time()
+    try:
+        data = json.loads(msg.payload)
+    except (ValueError, UnicodeDecodeError):
+        return
+
+    # Malformed trace metadata is skipped rather than raised inside the paho callback
+    try:
+        if msg.topic == TRACE_TOPIC:
+            record(f"span {data['node']}.{data['name']}", data["end"] - data["start"])
+            parent = data.get("parent")
+            if parent:
+                record(f"e2e {origin_node(parent)} -> {data['node']}", data["end"] - parent["origin"])
+            return
+
+        trace = data.get(TRACE_KEY) if isinstance(data, dict) else None
+        if not trace:
+            return
+
+        record(f"transport {msg.topic}", arrival - trace["t"])
+        parent = known_messages.get(trace.get("parent"))
+        if parent is not None:
+            record(f"hop {parent['node']} -> {trace['node']}", trace["t"] - parent["t"])
+
+        known_messages[trace["id"]] = trace
+        if len(known_messages) > MAX_KNOWN_MESSAGES:
+            known_messages.popitem(last=False)
+    except (KeyError, TypeError, AttributeError):
+        return
+
+def export(path):
+    with stats_lock:
+        summary = {key: hist.to_dict() for key, hist in sorted(histograms.items())}
+    with open(path, "w") as f:
+        json.dump({"exported_at": time.time(), "latencies": summary}, f, indent=2)
+
+    print(f"[node_trace.py] {'latency':<50} {'count':>7} {'p50':>7} {'p90':>7} {'p99':>7} {'max':>8}")
+    for key, s in summary.items():
+        print(f"[node_trace.py] {key:<50} {s['count']:>7} {s['p50_ms']:>5.1f}ms {s['p90_ms']:>5.1f}ms "
+              f"{s['p99_ms']:>5.1f}ms {s['max_ms']:>6.1f}ms")
+
+def main():
+    os.makedirs(LOG_DIR, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    export_path = os.path.join(LOG_DIR, f"latency_{timestamp}.json")
+
+    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+    client.on_connect = on_connect
+    client.on_message = on_message
+    client.connect(MQTT_BROKER, MQTT_PORT, keepalive=60)
+    client.loop_start()
+    print(f"[node_trace.py] Collecting latencies, exporting to {export_path}")
+
+    try:
+        while True:
+            time.sleep(EXPORT_INTERVAL)
+            export(export_path)
+
+    except KeyboardInterrupt:
+        print("\n[node_trace.py] Interrupted.")
+    finally:
+        client.loop_stop()
+        client.disconnect()
+        export(export_path)
+        print("[node_trace.py] Shutdown complete.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+# Adds the lib directory to the Python path
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import time
+import argparse
+import paho.mqtt.client as mqtt
+from lib.mqtt_log import LogReader
+
+MQTT_BROKER = "localhost"
+MQTT_PORT = 1883
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Republish a node_recorder.py log into an MQTT broker")
+    parser.add_argument("log", help="Path to a .sblog file")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Playback speed multiplier, 0 for as fast as possible (default: 1.0)")
+    parser.add_argument("--topics", nargs="+", default=None,
+                        help="Only replay these topics (default: all)")
+    parser.add_argument("--start", type=float, default=None,
+                        help="Seconds into the recording to start from")
+    parser.add_argument("--end", type=float, default=None,
+                        help="Seconds into the recording to stop at")
+    parser.add_argument("--broker", default=MQTT_BROKER)
+    parser.add_argument("--port", type=int, default=MQTT_PORT)
+    parser.add_argument("--list", action="store_true",
+                        help="Print the topics and message counts in the log and exit")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    reader = LogReader(args.log)
+
+    if args.list:
+        for topic, count in sorted(reader.topics().items()):
+            print(f"{topic}: {count}")
+        if reader.index:
+            duration = reader.index[-1]["t_end"] - reader.monotonic_time
+            print(f"{len(reader.index)} chunks, {duration:.1f} s")
+        reader.close()
+        return
+
+    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+    client.connect(args.broker, args.port, keepalive=60)
+    client.loop_start()
+
+    count = 0
+    first_t = None
+    wall_start = time.monotonic()
+    try:
+        for t, topic, payload in reader.read(args.topics, args.start, args.end):
+            if first_t is None:
+                first_t = t
+            if args.speed > 0:
+                delay = wall_start + (t - first_t) / args.speed - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            info = client.publish(topic, payload)
+            if args.speed <= 0:
+                # Keep the outgoing queue bounded when not pacing
+                info.wait_for_publish()
+            count += 1
+
+    except KeyboardInterrupt:
+        print("\n[replay.py] Interrupted.")
+    finally:
+        elapsed = time.monotonic() - wall_start
+        client.loop_stop()
+        client.disconnect()
+        reader.close()
+        print(f"[replay.py] Replayed {count} messages in {elapsed:.1f} s")
+
+if __name__ == "__main__":
+    main()
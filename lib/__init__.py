@@ -1,3 +1,3 @@
 # -*- coding: utf-8 -*-
 
-__all__ = ["imu", "lqr", "odrive_uart", "madgwickahrs"]
\ No newline at end of file
+__all__ = ["imu", "lqr", "odrive_uart", "madgwickahrs", "mqtt_log", "tracing", "frame_ring", "supabase_batch"]
\ No newline at end of file
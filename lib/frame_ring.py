@@ -0,0 +1,162 @@
+import time
+import numpy as np
+from multiprocessing import shared_memory, resource_tracker
+
+# -----------------------------------------------------------------------------
+# Shared Memory Layout
+# -----------------------------------------------------------------------------
+# HEADER (int64 x 8) | slot seq (int64 x N) | slot timestamp (float64 x N) | N frames
+#
+# The writer fills slot (seq % N), marking it -1 while writing, then publishes
+# seq in the slot and in HEADER[LATEST]. Readers never take a lock: they look up
+# the newest slot and check its seq is unchanged after they are done with it.
+RING_NAME = "stuffbot_camera"
+RING_MAGIC = 0x53424652  # "SBFR"
+DEFAULT_SLOTS = 8
+
+MAGIC, SLOTS, HEIGHT, WIDTH, CHANNELS, LATEST = range(6)
+HEADER_LEN = 8
+
+class FrameRing:
+    def __init__(self, shm, owner):
+        self.shm = shm
+        self.owner = owner
+        header = np.ndarray((HEADER_LEN,), dtype=np.int64, buffer=shm.buf)
+        if header[MAGIC] != RING_MAGIC:
+            raise ValueError(f"Shared memory '{shm.name}' is not a frame ring")
+        slots = int(header[SLOTS])
+        shape = (int(header[HEIGHT]), int(header[WIDTH]), int(header[CHANNELS]))
+
+        offset = header.nbytes
+        self.header = header
+        self.slot_seq = np.ndarray((slots,), dtype=np.int64, buffer=shm.buf, offset=offset)
+        offset += self.slot_seq.nbytes
+        self.slot_ts = np.ndarray((slots,), dtype=np.float64, buffer=shm.buf, offset=offset)
+        offset += self.slot_ts.nbytes
+        self.frames = np.ndarray((slots,) + shape, dtype=np.uint8, buffer=shm.buf, offset=offset)
+        self.slots = slots
+        self.shape = shape
+
+    @classmethod
+    def create(cls, shape, name=RING_NAME, slots=DEFAULT_SLOTS):
+        """
+        Create the ring as the single writer, replacing a stale one left behind by a crash.
+        :param shape: Frame shape (height, width, channels)
+        """
+        size = 8 * (HEADER_LEN + 2 * slots) + slots * int(np.prod(shape))
+        try:
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+        except FileNotFoundError:
+            pass
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        header = np.ndarray((HEADER_LEN,), dtype=np.int64, buffer=shm.buf)
+        header[:] = 0
+        header[SLOTS], header[HEIGHT], header[WIDTH], header[CHANNELS] = slots, *shape
+        header[MAGIC] = RING_MAGIC
+        ring = cls(shm, owner=True)
+        ring.slot_seq[:] = 0
+        return ring
+
+    @classmethod
+    def attach(cls, name=RING_NAME):
+        """Attach to an existing ring as a reader."""
+        shm = shared_memory.SharedMemory(name=name)
+        # Readers must not unlink the segment when they exit (Python < 3.13 registers it)
+        try:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+        return cls(shm, owner=False)
+
+    def write(self, frame, timestamp):
+        """Copy a frame into the next slot and publish it. Returns its sequence number."""
+        seq = int(self.header[LATEST]) + 1
+        idx = seq % self.slots
+        self.slot_seq[idx] = -1
+        self.frames[idx][...] = frame
+        self.slot_ts[idx] = timestamp
+        self.slot_seq[idx] = seq
+        self.header[LATEST] = seq
+        return seq
+
+    def latest_seq(self):
+        return int(self.header[LATEST])
+
+    def latest(self, copy=False):
+        """
+        Newest frame as (seq, timestamp, frame), or (0, 0.0, None) before the first frame.
+        With copy=False the frame is a zero-copy view into shared memory; it stays
+        valid until the writer laps the ring, which valid(seq) reports.
+        """
+        while True:
+            seq = self.latest_seq()
+            if seq == 0:
+                return 0, 0.0, None
+            idx = seq % self.slots
+            timestamp = float(self.slot_ts[idx])
+            frame = self.frames[idx].copy() if copy else self.frames[idx]
+            if self.slot_seq[idx] == seq:
+                return seq, timestamp, frame
+            # The writer lapped us mid-read; take the newer frame instead
+
+    def valid(self, seq):
+        """True while the slot for seq has not been overwritten."""
+        return self.slot_seq[seq % self.slots] == seq
+
+    def wait_for_new(self, after_seq, timeout=1.0, poll=0.002):
+        """Block until a frame newer than after_seq is published. Returns the new seq or None."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            seq = self.latest_seq()
+            if seq > after_seq:
+                return seq
+            time.sleep(poll)
+        return None
+
+    def close(self):
+        # Drop our numpy views before closing the mapping
+        self.header = self.slot_seq = self.slot_ts = self.frames = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+class SharedCamera:
+    def __init__(self, name=RING_NAME, copy=True, timeout=5.0):
+        """
+        Drop-in replacement for cv2.VideoCapture(0) that reads the newest frame
+        published by core/node_camera.py instead of opening the camera itself.
+        :param copy: Return private copies; pass False for zero-copy views
+        :param timeout: Seconds to wait for the camera service to come up
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                self.ring = FrameRing.attach(name)
+                break
+            except FileNotFoundError:
+                if time.monotonic() > deadline:
+                    raise FileNotFoundError(
+                        f"No camera ring '{name}' - start core/node_camera.py first")
+                time.sleep(0.1)
+        self.copy = copy
+        self.last_seq = 0
+        self.last_timestamp = 0.0
+
+    def read(self):
+        """Newest frame as (ret, frame); waits briefly if nothing has been captured yet."""
+        if self.ring.latest_seq() == 0 and self.ring.wait_for_new(0) is None:
+            return False, None
+        seq, timestamp, frame = self.ring.latest(copy=self.copy)
+        self.last_seq = seq
+        self.last_timestamp = timestamp
+        return frame is not None, frame
+
+    def isOpened(self):
+        return self.ring is not None
+
+    def release(self):
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
@@ -0,0 +1,179 @@
+import json
+import os
+import struct
+import zlib
+
+# -----------------------------------------------------------------------------
+# File Layout
+# -----------------------------------------------------------------------------
+# <log>.sblog   FILE_MAGIC, FILE_HEADER, then chunks appended back to back:
+#                   CHUNK_HEADER + (zlib-compressed) records
+#               each record is RECORD_HEADER + topic bytes + payload bytes
+# <log>.idx     one JSON line per chunk: offset, length, time range, topic counts
+#
+# Both files are only ever appended to, so a crash loses at most the chunk
+# that was still being buffered. The index can be rebuilt from the chunk
+# headers if it goes missing.
+FILE_MAGIC    = b"SBLOG1\n"
+FILE_HEADER   = struct.Struct("<dd")        # wall clock, monotonic clock at start
+CHUNK_MAGIC   = b"CHNK"
+CHUNK_HEADER  = struct.Struct("<4sBIIdd")   # magic, compressed, count, length, t_start, t_end
+RECORD_HEADER = struct.Struct("<dHI")       # monotonic timestamp, topic length, payload length
+
+class LogWriter:
+    def __init__(self, path, wall_time, monotonic_time, compress=True):
+        """
+        Open (or create) an append-only MQTT log.
+        :param path: Log file path; the index is written next to it as <path>.idx
+        :param wall_time: time.time() when recording started
+        :param monotonic_time: time.monotonic() when recording started
+        :param compress: zlib-compress each chunk
+        """
+        self.path = path
+        self.index_path = path + ".idx"
+        self.compress = compress
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.f = open(path, "ab")
+        self.index_f = open(self.index_path, "a")
+        if new_file:
+            self.f.write(FILE_MAGIC + FILE_HEADER.pack(wall_time, monotonic_time))
+            self.f.flush()
+
+    def write_chunk(self, records):
+        """
+        Append one chunk.
+        :param records: List of (monotonic_time, topic, payload_bytes), in time order
+        """
+        if not records:
+            return
+        parts = []
+        topics = {}
+        for t, topic, payload in records:
+            topic_b = topic.encode()
+            parts.append(RECORD_HEADER.pack(t, len(topic_b), len(payload)))
+            parts.append(topic_b)
+            parts.append(payload)
+            topics[topic] = topics.get(topic, 0) + 1
+        body = b"".join(parts)
+        if self.compress:
+            body = zlib.compress(body, 1)
+
+        t_start = records[0][0]
+        t_end = records[-1][0]
+        offset = self.f.tell()
+        self.f.write(CHUNK_HEADER.pack(CHUNK_MAGIC, int(self.compress), len(records), len(body), t_start, t_end))
+        self.f.write(body)
+        self.f.flush()
+
+        self.index_f.write(json.dumps({
+            "offset": offset,
+            "length": CHUNK_HEADER.size + len(body),
+            "t_start": t_start,
+            "t_end": t_end,
+            "topics": topics,
+        }) + "\n")
+        self.index_f.flush()
+
+    def close(self):
+        self.f.close()
+        self.index_f.close()
+
+class LogReader:
+    def __init__(self, path):
+        """
+        Open an MQTT log for reading.
+        :param path: Log file path written by LogWriter
+        """
+        self.path = path
+        self.f = open(path, "rb")
+        if self.f.read(len(FILE_MAGIC)) != FILE_MAGIC:
+            raise ValueError(f"{path} is not a stuffbot MQTT log")
+        self.wall_time, self.monotonic_time = FILE_HEADER.unpack(self.f.read(FILE_HEADER.size))
+        self.index = self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self.path + ".idx") as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except (OSError, ValueError):
+            return self._scan_index()
+
+    def _scan_index(self):
+        """Rebuild the chunk index from chunk headers (topic counts are not recovered)."""
+        index = []
+        offset = len(FILE_MAGIC) + FILE_HEADER.size
+        self.f.seek(offset)
+        while True:
+            header = self.f.read(CHUNK_HEADER.size)
+            if len(header) < CHUNK_HEADER.size:
+                break
+            magic, _, _, length, t_start, t_end = CHUNK_HEADER.unpack(header)
+            if magic != CHUNK_MAGIC:
+                break
+            index.append({
+                "offset": offset,
+                "length": CHUNK_HEADER.size + length,
+                "t_start": t_start,
+                "t_end": t_end,
+                "topics": None,
+            })
+            offset += CHUNK_HEADER.size + length
+            self.f.seek(offset)
+        return index
+
+    def topics(self):
+        """Message count per topic, from the index."""
+        counts = {}
+        for entry in self.index:
+            for topic, n in (entry["topics"] or {}).items():
+                counts[topic] = counts.get(topic, 0) + n
+        return counts
+
+    def read(self, topics=None, t_start=None, t_end=None):
+        """
+        Yield (monotonic_time, topic, payload) in recorded order.
+        Chunks outside the time window or without any wanted topic are skipped
+        using the index, without being read or decompressed.
+        :param topics: Optional collection of topics to keep
+        :param t_start: Optional start, in seconds since the start of the recording
+        :param t_end: Optional end, in seconds since the start of the recording
+        """
+        lo = None if t_start is None else self.monotonic_time + t_start
+        hi = None if t_end is None else self.monotonic_time + t_end
+        wanted = set(topics) if topics else None
+
+        for entry in self.index:
+            if lo is not None and entry["t_end"] < lo:
+                continue
+            if hi is not None and entry["t_start"] > hi:
+                break
+            if wanted and entry["topics"] is not None and not wanted.intersection(entry["topics"]):
+                continue
+
+            self.f.seek(entry["offset"])
+            magic, compressed, count, length, _, _ = CHUNK_HEADER.unpack(self.f.read(CHUNK_HEADER.size))
+            if magic != CHUNK_MAGIC:
+                raise ValueError(f"Corrupt chunk at offset {entry['offset']}")
+            body = self.f.read(length)
+            if compressed:
+                body = zlib.decompress(body)
+
+            pos = 0
+            for _ in range(count):
+                t, topic_len, payload_len = RECORD_HEADER.unpack_from(body, pos)
+                pos += RECORD_HEADER.size
+                topic = body[pos:pos + topic_len].decode()
+                pos += topic_len
+                payload = body[pos:pos + payload_len]
+                pos += payload_len
+
+                if lo is not None and t < lo:
+                    continue
+                if hi is not None and t > hi:
+                    return
+                if wanted and topic not in wanted:
+                    continue
+                yield t, topic, payload
+
+    def close(self):
+        self.f.close()
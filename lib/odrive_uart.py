@@ -14,18 +14,11 @@ class ODriveUART:
     ERROR_DICT = {k: v for k, v in odrive.enums.__dict__ .items() if k.startswith("AXIS_ERROR_")}
 
     SERIAL_PORT = '/dev/ttyAMA1'
-    _bus = serial.Serial(
-        port=SERIAL_PORT,
-        baudrate=115200,
-        parity=serial.PARITY_NONE,
-        stopbits=serial.STOPBITS_ONE,
-        bytesize=serial.EIGHTBITS,
-        timeout=1
-    )
-
-    def __init__(self, port='/dev/ttyAMA1', left_axis=0, right_axis=1, dir_left=1, dir_right=1):
-        self.bus = serial.Serial(
-            port=port,
+
+    def __init__(self, port=SERIAL_PORT, left_axis=0, right_axis=1, dir_left=1, dir_right=1):
+        # serial_for_url also accepts "socket://host:port", e.g. the core/node_sim.py endpoint
+        self.bus = serial.serial_for_url(
+            port,
             baudrate=115200,
             parity=serial.PARITY_NONE,
             stopbits=serial.STOPBITS_ONE,
@@ -0,0 +1,321 @@
+import math
+import os
+import socket
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+# -----------------------------------------------------------------------------
+# Configuration
+# -----------------------------------------------------------------------------
+# Set STUFFBOT_SIM=host:port to point the core nodes at core/node_sim.py
+# instead of the ODrive UART and the VL53L5CX sensors.
+SIM_ENDPOINT = os.getenv("STUFFBOT_SIM")
+
+# Robot geometry, matching node_odometry.py / odrive_uart.py
+WHEEL_DIAMETER = 0.165  # meters
+WHEEL_BASE = 0.420      # meters
+ROBOT_RADIUS = 0.25     # meters, footprint used for collisions
+
+# VL53L5CX model, matching node_map.py
+SIM_SENSOR_ADDRESSES = [0x52, 0x54, 0x56]
+TOF_FOV_DEG = 60
+TOF_OFFSET_8X8 = 3.75
+TOF_SENSOR_HEIGHT = 0.75
+TOF_OFFSET_TOWARDS_CENTER = -0.5
+TOF_TILT_DEG = -30.0
+TOF_Z_ANGLES_DEG = [-60.0, 0.0, 60.0]
+TOF_MAX_RANGE = 4.0     # meters
+TOF_NOISE_MM = 5.0
+TOF_RATE = 15           # Hz
+TOF_STATUS_VALID = 5
+TOF_STATUS_NO_TARGET = 255
+
+class SimWorld:
+    def __init__(self, width=6.0, height=5.0, obstacles=None, seed=None):
+        """
+        A rectangular room centred on the origin with box obstacles, and a
+        differential-drive robot driven by per-wheel velocities.
+        :param width: Room size along x in meters
+        :param height: Room size along y in meters
+        :param obstacles: List of (min_x, min_y, max_x, max_y, height) boxes
+        :param seed: Seed for the range noise
+        """
+        self.width = width
+        self.height = height
+        if obstacles is None:
+            obstacles = [
+                (1.0, -0.4, 1.8, 0.4, 0.75),    # Table ahead of the start pose
+                (-1.5, 1.2, -0.9, 1.8, 0.45),   # Chair
+                (-2.5, -2.0, -1.5, -1.6, 1.0),  # Shelf
+            ]
+        self.obstacles = np.array(obstacles, dtype=np.float64).reshape(-1, 5)
+        self.rng = np.random.default_rng(seed)
+
+        self.x = 0.0
+        self.y = 0.0
+        self.theta = 0.0
+        self.sim_time = 0.0
+        self.wheel_vel = [0.0, 0.0]   # turns/s, forward positive
+        self.wheel_pos = [0.0, 0.0]   # turns
+        self.closed_loop = [False, False]
+
+        self.rays = [tof_rays(i) for i in range(len(TOF_Z_ANGLES_DEG))]
+
+    # -------------------------------------------------------------------------
+    # Kinematics
+    # -------------------------------------------------------------------------
+    def step(self, dt):
+        """Advance the world by dt seconds of simulated time."""
+        circumference = WHEEL_DIAMETER * math.pi
+        left = self.wheel_vel[0] * circumference if self.closed_loop[0] else 0.0
+        right = self.wheel_vel[1] * circumference if self.closed_loop[1] else 0.0
+
+        v = (left + right) / 2.0
+        w = (right - left) / WHEEL_BASE
+        new_theta = self.theta + w * dt
+        new_x = self.x + v * dt * math.cos(self.theta + w * dt / 2.0)
+        new_y = self.y + v * dt * math.sin(self.theta + w * dt / 2.0)
+
+        # Stall against walls and obstacles: neither the pose nor the wheels move
+        if not self.collides(new_x, new_y):
+            self.x, self.y = new_x, new_y
+            self.theta = (new_theta + math.pi) % (2 * math.pi) - math.pi
+            self.wheel_pos[0] += left / circumference * dt
+            self.wheel_pos[1] += right / circumference * dt
+        self.sim_time += dt
+
+    def collides(self, x, y):
+        if abs(x) > self.width / 2 - ROBOT_RADIUS or abs(y) > self.height / 2 - ROBOT_RADIUS:
+            return True
+        if len(self.obstacles) == 0:
+            return False
+        ob = self.obstacles
+        nearest_x = np.clip(x, ob[:, 0], ob[:, 2])
+        nearest_y = np.clip(y, ob[:, 1], ob[:, 3])
+        return bool(np.any(np.hypot(nearest_x - x, nearest_y - y) < ROBOT_RADIUS))
+
+    # -------------------------------------------------------------------------
+    # VL53L5CX
+    # -------------------------------------------------------------------------
+    def tof_zones(self, sensor_index):
+        """
+        Simulated 8x8 ranging for one sensor.
+        Returns (distance_mm, target_status) lists of 64 ints each.
+        """
+        origins, dirs = self.rays[sensor_index]
+        c = math.cos(self.theta)
+        s = math.sin(self.theta)
+        rot = np.array([[c, s, 0.0], [-s, c, 0.0], [0.0, 0.0, 1.0]])
+        o = origins @ rot + np.array([self.x, self.y, 0.0])
+        d = dirs @ rot
+
+        dist = np.full(len(d), np.inf)
+
+        # Floor
+        down = d[:, 2] < 0
+        dist[down] = -o[down, 2] / d[down, 2]
+
+        # Room walls and obstacle boxes, both via the slab test
+        dist = np.minimum(dist, self._exit_distance(o, d))
+        for box in self.obstacles:
+            dist = np.minimum(dist, self._box_distance(o, d, box))
+
+        noisy = dist + self.rng.normal(0.0, TOF_NOISE_MM * 0.001, len(dist))
+        valid = np.isfinite(dist) & (dist <= TOF_MAX_RANGE)
+        distance_mm = np.where(valid, np.clip(noisy, 0.0, None) * 1000.0, 0.0).astype(int)
+        target_status = np.where(valid, TOF_STATUS_VALID, TOF_STATUS_NO_TARGET)
+        return distance_mm.tolist(), target_status.tolist()
+
+    def _exit_distance(self, o, d):
+        """Distance along each ray to the inside of the room walls."""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            tx = np.where(d[:, 0] > 0, (self.width / 2 - o[:, 0]) / d[:, 0],
+                          np.where(d[:, 0] < 0, (-self.width / 2 - o[:, 0]) / d[:, 0], np.inf))
+            ty = np.where(d[:, 1] > 0, (self.height / 2 - o[:, 1]) / d[:, 1],
+                          np.where(d[:, 1] < 0, (-self.height / 2 - o[:, 1]) / d[:, 1], np.inf))
+        return np.minimum(tx, ty)
+
+    def _box_distance(self, o, d, box):
+        lo = np.array([box[0], box[1], 0.0])
+        hi = np.array([box[2], box[3], box[4]])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t1 = (lo - o) / d
+            t2 = (hi - o) / d
+        t_near = np.nanmax(np.minimum(t1, t2), axis=1)
+        t_far = np.nanmin(np.maximum(t1, t2), axis=1)
+        hit = (t_far >= t_near) & (t_far > 0)
+        return np.where(hit, np.maximum(t_near, 0.0), np.inf)
+
+def tof_rays(sensor_index):
+    """
+    Ray origins and unit directions (robot frame) for the 64 zones of one
+    sensor, using the same geometry node_map.py uses to turn ranges into points.
+    """
+    angles = np.linspace(-TOF_FOV_DEG / 2 + TOF_OFFSET_8X8, TOF_FOV_DEG / 2 - TOF_OFFSET_8X8, 8)
+    vert = np.radians(np.repeat(angles, 8))
+    horiz = np.radians(np.tile(angles, 8))
+    dirs = np.column_stack((
+        np.cos(vert) * np.cos(horiz),
+        np.cos(vert) * np.sin(horiz),
+        np.sin(vert),
+    ))
+    offset_angle = math.radians(sensor_index * 60)
+    origin = np.array([
+        TOF_OFFSET_TOWARDS_CENTER * math.cos(offset_angle),
+        TOF_OFFSET_TOWARDS_CENTER * math.sin(offset_angle),
+        TOF_SENSOR_HEIGHT,
+    ])
+
+    tilt = math.radians(TOF_TILT_DEG)
+    z_angle = math.radians(TOF_Z_ANGLES_DEG[sensor_index])
+    rot_y = np.array([
+        [ math.cos(tilt), 0, math.sin(tilt)],
+        [ 0,              1, 0             ],
+        [-math.sin(tilt), 0, math.cos(tilt)],
+    ])
+    rot_z = np.array([
+        [math.cos(z_angle), -math.sin(z_angle), 0],
+        [math.sin(z_angle),  math.cos(z_angle), 0],
+        [0,                  0,                 1],
+    ])
+    rot = rot_y @ rot_z
+    origins = np.tile(origin @ rot, (64, 1))
+    return origins, dirs @ rot
+
+class FakeODrive:
+    def __init__(self, world, lock):
+        """
+        Answers ODrive ASCII protocol lines against a SimWorld.
+        Supports the subset lib/odrive_uart.py uses, plus 't <sensor>' which
+        returns 64 distances followed by 64 target statuses for the ToF model.
+        """
+        self.world = world
+        self.lock = lock
+
+    def handle(self, line):
+        """Return the response line for a command, or None for write commands."""
+        parts = line.split()
+        if not parts:
+            return None
+        cmd = parts[0]
+        with self.lock:
+            if cmd == 'w' and len(parts) >= 3:
+                self._write(parts[1], float(parts[2]))
+                return None
+            if cmd == 'r' and len(parts) >= 2:
+                return self._read(parts[1])
+            if cmd == 'f' and len(parts) >= 2:
+                axis = int(parts[1])
+                return f"{self.world.wheel_pos[axis]:.6f} {self._vel(axis):.6f}"
+            if cmd == 't' and len(parts) >= 2:
+                distances, statuses = self.world.tof_zones(int(parts[1]))
+                return " ".join(str(v) for v in distances + statuses)
+        # 'c', 'u' (torque) and anything else are accepted silently
+        return None
+
+    def _axis(self, prop):
+        # "axis0.controller.input_vel" -> (0, "controller.input_vel")
+        head, _, rest = prop.partition('.')
+        return int(head[len('axis'):]), rest
+
+    def _write(self, prop, value):
+        axis, rest = self._axis(prop)
+        if rest == 'controller.input_vel':
+            self.world.wheel_vel[axis] = value
+        elif rest == 'requested_state':
+            self.world.closed_loop[axis] = int(value) == 8
+
+    def _read(self, prop):
+        axis, rest = self._axis(prop)
+        if rest == 'encoder.pos_estimate':
+            return f"{self.world.wheel_pos[axis]:.6f}"
+        if rest == 'encoder.vel_estimate':
+            return f"{self._vel(axis):.6f}"
+        if rest.endswith('error'):
+            return "0"
+        if rest == 'current_state':
+            return "8" if self.world.closed_loop[axis] else "1"
+        return "invalid property"
+
+    def _vel(self, axis):
+        return self.world.wheel_vel[axis] if self.world.closed_loop[axis] else 0.0
+
+# -----------------------------------------------------------------------------
+# Hardware Stand-ins for node_map.py
+# -----------------------------------------------------------------------------
+class SimGPIO:
+    """No-op replacement for RPi.GPIO."""
+    BCM = 11
+    OUT = 0
+    LOW = 0
+    HIGH = 1
+
+    @staticmethod
+    def setmode(mode):
+        pass
+
+    @staticmethod
+    def setup(pin, mode):
+        pass
+
+    @staticmethod
+    def output(pin, value):
+        pass
+
+    @staticmethod
+    def cleanup():
+        pass
+
+class SimClient:
+    _instance = None
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            cls._instance = cls(SIM_ENDPOINT)
+        return cls._instance
+
+    def __init__(self, endpoint):
+        """Line-based connection to the core/node_sim.py endpoint, shared by all sensors."""
+        host, _, port = endpoint.rpartition(':')
+        self.sock = socket.create_connection((host or "localhost", int(port)))
+        self.rfile = self.sock.makefile('r')
+        self.lock = threading.Lock()
+
+    def query(self, command):
+        with self.lock:
+            self.sock.sendall(f"{command}\n".encode())
+            return self.rfile.readline().strip()
+
+class SimVL53L5CX:
+    def __init__(self, i2c_address=SIM_SENSOR_ADDRESSES[0], **kwargs):
+        """Stand-in for lib.vl53l5cx_lib.vl53l5cx.VL53L5CX backed by the simulator."""
+        self.i2c_address = i2c_address
+        self.last_read = 0.0
+
+    def set_i2c_address(self, i2c_address):
+        self.i2c_address = i2c_address
+
+    def is_alive(self):
+        return True
+
+    def init(self):
+        pass
+
+    def set_resolution(self, resolution):
+        pass
+
+    def start_ranging(self):
+        pass
+
+    def check_data_ready(self):
+        return time.monotonic() - self.last_read >= 1.0 / TOF_RATE
+
+    def get_ranging_data(self):
+        self.last_read = time.monotonic()
+        index = SIM_SENSOR_ADDRESSES.index(self.i2c_address)
+        values = [int(v) for v in SimClient.get_instance().query(f"t {index}").split()]
+        return SimpleNamespace(distance_mm=values[:64], target_status=values[64:])
@@ -0,0 +1,114 @@
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# -----------------------------------------------------------------------------
+# Batched Supabase uploads
+# -----------------------------------------------------------------------------
+# Both storage objects of every pair are uploaded in parallel on a shared thread
+# pool. All threads go through one bucket handle, so they share its pooled HTTP
+# connections. Rows for the pairs that made it are then inserted with a single
+# insert() per BATCH_SIZE. Throughput when flushing a backlog is therefore
+# limited by bandwidth rather than by per-request round trips.
+BUCKET = "stuff_images_bucket"
+TABLE = "stuff"
+MAX_WORKERS = 8
+BATCH_SIZE = 50
+
+CONTENT_TYPES = {".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".png": "image/png", ".webp": "image/webp"}
+
+def read_image_file(path):
+    """(data, extension, content type) for an image file, as accepted by BatchUploader."""
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, "rb") as f:
+        return f.read(), extension, CONTENT_TYPES.get(extension, "application/octet-stream")
+
+def stuff_row(full_image_id, partial_image_id):
+    return {
+        "full_image_id": full_image_id,
+        "partial_image_id": partial_image_id,
+        "class": "unknown",
+        "approximate_price": 0.00,
+        "location_description": "unknown"
+    }
+
+class BatchUploader:
+    def __init__(self, supabase_client, bucket=BUCKET, table=TABLE, max_workers=MAX_WORKERS, batch_size=BATCH_SIZE):
+        """
+        Upload image pairs concurrently and insert their rows in batches.
+        :param supabase_client: Client from supabase.create_client
+        :param max_workers: Storage uploads in flight at once
+        :param batch_size: Rows per insert() call
+        """
+        self.client = supabase_client
+        self.bucket = supabase_client.storage.from_(bucket)
+        self.table = table
+        self.batch_size = batch_size
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="supabase-upload")
+
+    def upload_object(self, name, image, upsert):
+        data, _, content_type = image
+        file_options = {"content-type": content_type}
+        if upsert:
+            file_options["upsert"] = "true"
+        self.bucket.upload(name, data, file_options=file_options)
+
+    def upload_pairs(self, pairs):
+        """
+        Upload (key, full_image, partial_image) items, images as (data, extension, content type).
+        With a key (idempotency key) object names are derived from it and overwritten on
+        retry, and no second row is inserted; with key=None random names are used.
+        :return: {index: error string or None} for every item, in input order
+        """
+        names = []
+        futures = []
+        for key, full_image, partial_image in pairs:
+            pair_names = []
+            pair_futures = []
+            for suffix, image in (("full", full_image), ("partial", partial_image)):
+                name = f"{key}_{suffix}{image[1]}" if key else f"{uuid.uuid4()}{image[1]}"
+                pair_names.append(name)
+                pair_futures.append(self.executor.submit(self.upload_object, name, image, key is not None))
+            names.append(pair_names)
+            futures.append(pair_futures)
+
+        errors = {}
+        uploaded = []
+        for i, pair_futures in enumerate(futures):
+            errors[i] = None
+            for future in pair_futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    errors[i] = str(e)
+            if errors[i] is None:
+                uploaded.append(i)
+
+        for start in range(0, len(uploaded), self.batch_size):
+            batch = uploaded[start:start + self.batch_size]
+            try:
+                self.insert_rows([pairs[i][0] for i in batch], [names[i] for i in batch])
+            except Exception as e:
+                for i in batch:
+                    errors[i] = str(e)
+        return errors
+
+    def insert_rows(self, keys, names):
+        """Insert one stuff row per uploaded pair, skipping keyed pairs a retry already inserted."""
+        keyed = [full for key, (full, _) in zip(keys, names) if key]
+        existing = set()
+        if keyed:
+            result = self.client.table(self.table).select("full_image_id").in_("full_image_id", keyed).execute()
+            existing = {row["full_image_id"] for row in result.data}
+        rows = [stuff_row(full, partial) for full, partial in names if full not in existing]
+        if rows:
+            self.client.table(self.table).insert(rows).execute()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,119 @@
+import json
+import time
+import bisect
+import itertools
+from contextlib import contextmanager
+
+# -----------------------------------------------------------------------------
+# Trace Metadata
+# -----------------------------------------------------------------------------
+# Every traced JSON message carries a "_trace" entry:
+#   id      "<node>:<seq>", unique per published message
+#   node    publishing node
+#   seq     per-node sequence number
+#   t       time.time() at publish
+#   origin  time.time() when the oldest input in the causal chain was published
+#   parent  id of the message this one was computed from, or None
+# Processing spans are published separately on TRACE_TOPIC.
+TRACE_KEY = "_trace"
+TRACE_TOPIC = "robot/trace"
+
+class Tracer:
+    def __init__(self, node, client=None):
+        """
+        Stamp outgoing messages and report processing spans for one node.
+        :param node: Node name, e.g. "node_map"
+        :param client: paho MQTT client used to publish spans (can be set later)
+        """
+        self.node = node
+        self.client = client
+        self._seq = itertools.count()
+
+    def stamp(self, msg, parent=None):
+        """
+        Add trace metadata to an outgoing message dict and return it.
+        :param msg: JSON-serialisable dict about to be published
+        :param parent: Trace dict of the input this message was derived from
+        """
+        now = time.time()
+        seq = next(self._seq)
+        msg[TRACE_KEY] = {
+            "id": f"{self.node}:{seq}",
+            "node": self.node,
+            "seq": seq,
+            "t": now,
+            "origin": parent["origin"] if parent else now,
+            "parent": parent["id"] if parent else None,
+        }
+        return msg
+
+    @staticmethod
+    def extract(msg):
+        """Trace metadata of a received message dict, or None if untraced."""
+        if isinstance(msg, dict):
+            return msg.get(TRACE_KEY)
+        return None
+
+    @contextmanager
+    def span(self, name, parent=None):
+        """
+        Time a block of processing and publish it as a span.
+        :param name: Span name, e.g. "plan"
+        :param parent: Trace dict of the input being processed
+        """
+        start = time.time()
+        try:
+            yield
+        finally:
+            end = time.time()
+            if self.client is not None:
+                self.client.publish(TRACE_TOPIC, json.dumps({
+                    "node": self.node,
+                    "name": name,
+                    "start": start,
+                    "end": end,
+                    "parent": parent,
+                }))
+
+# -----------------------------------------------------------------------------
+# Histograms
+# -----------------------------------------------------------------------------
+# Bucket upper bounds in milliseconds; the last bucket is open-ended
+BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, ms):
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def percentile(self, p):
+        """Upper bound of the bucket containing the p-th percentile (ms), capped at the max seen."""
+        if self.count == 0:
+            return 0.0
+        target = p / 100.0 * self.count
+        running = 0
+        for i, n in enumerate(self.counts):
+            running += n
+            if running >= target:
+                return min(BUCKETS_MS[i], self.max) if i < len(BUCKETS_MS) else self.max
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count if self.count else 0.0,
+            "max_ms": self.max,
+            "p50_ms": self.percentile(50),
+            "p90_ms": self.percentile(90),
+            "p99_ms": self.percentile(99),
+            "buckets_ms": BUCKETS_MS,
+            "counts": self.counts,
+        }
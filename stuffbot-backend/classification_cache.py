@@ -0,0 +1,96 @@
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+from PIL import Image
+
+# -----------------------------------------------------------------------------
+# Classification cache
+# -----------------------------------------------------------------------------
+# Remembers the LLM's answer for every crop it has classified, keyed by the
+# crop's 64-bit DCT perceptual hash. A new crop within MATCH_THRESHOLD bits of a
+# known one reuses its class and price instead of costing a request. Location
+# is not cached: it describes one sighting, not the item.
+# Lookups are an exact vectorised Hamming search, which is well under a
+# millisecond at household scale (thousands of items), so no ANN index is needed.
+CACHE_PATH = os.path.expanduser("~/.stuffbot/classification_cache.json")
+MATCH_THRESHOLD = 6     # of 64 bits
+MAX_ENTRIES = 5000      # least recently used entries are evicted beyond this
+CACHED_FIELDS = ("class", "approximate_price")
+
+HASH_SIZE = 32
+# Unnormalised DCT-II basis, so the hash needs only numpy and PIL. Its scale only
+# differs from the orthonormal one along the first row and column, identically
+# for every image, so hashes stay comparable with each other.
+_n = np.arange(HASH_SIZE)
+DCT_MATRIX = np.cos(np.pi * (2 * _n[None, :] + 1) * _n[:, None] / (2 * HASH_SIZE))
+
+def image_phash(data):
+    """64-bit perceptual hash of encoded image bytes."""
+    with Image.open(io.BytesIO(data)) as img:
+        grey = np.asarray(img.convert("L").resize((HASH_SIZE, HASH_SIZE), Image.Resampling.BILINEAR),
+                          dtype=np.float64)
+    low = (DCT_MATRIX @ grey @ DCT_MATRIX.T)[:8, :8].flatten()
+    bits = low > np.median(low[1:])
+    return int(np.packbits(bits).view(">u8")[0])
+
+class ClassificationCache:
+    def __init__(self, path=CACHE_PATH, threshold=MATCH_THRESHOLD, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()   # phash -> result dict, least recently used first
+        self.hits = 0
+        self.misses = 0
+        self.dirty = False
+        if os.path.exists(path):
+            with open(path) as f:
+                for entry in json.load(f):
+                    self.entries[entry["phash"]] = {field: entry[field] for field in CACHED_FIELDS}
+        self.rebuild()
+
+    def rebuild(self):
+        self.keys = list(self.entries)
+        self.hashes = np.array(self.keys, dtype=np.uint64)
+
+    def lookup(self, phash):
+        """Cached result dict (class, approximate_price) for a crop hash, or None."""
+        with self.lock:
+            if len(self.keys):
+                xor = self.hashes ^ np.uint64(phash)
+                distances = np.unpackbits(xor.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+                i = int(np.argmin(distances))
+                if distances[i] <= self.threshold:
+                    key = self.keys[i]
+                    self.entries.move_to_end(key)
+                    self.dirty = True
+                    self.hits += 1
+                    return dict(self.entries[key])
+            self.misses += 1
+            return None
+
+    def add(self, phash, result):
+        """Remember the class and price of a fresh LLM result, evicting the least recently used entries if full."""
+        with self.lock:
+            self.entries[phash] = {field: result[field] for field in CACHED_FIELDS}
+            self.entries.move_to_end(phash)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            self.dirty = True
+            self.rebuild()
+
+    def save(self):
+        """Write the cache (in LRU order) atomically, if it changed."""
+        with self.lock:
+            if not self.dirty:
+                return
+            entries = [dict(result, phash=phash) for phash, result in self.entries.items()]
+            self.dirty = False
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,369 @@
+import argparse
+import base64
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import List
+from pydantic import BaseModel
+from classification_cache import ClassificationCache, CACHE_PATH, image_phash
+
+# -----------------------------------------------------------------------------
+# Batch classification worker
+# -----------------------------------------------------------------------------
+# Replaces the per-row classify_image webhook. Unclassified stuff rows
+# (classified_at is null) are claimed in bulk by stamping claimed_at, their
+# images are sent BATCH_SIZE items per multimodal request, and the results are
+# written back in one upsert per poll. A claim older than CLAIM_LEASE belongs to
+# a worker that died and is taken over; a row that fails MAX_ATTEMPTS times is
+# left alone. MAX_CONCURRENT and REQUESTS_PER_MINUTE cap the LLM spend.
+BUCKET = 'stuff_images_bucket'
+TABLE = 'stuff'
+UNKNOWN = 'unknown'
+
+BATCH_SIZE = 4              # items (crop + full image each) per LLM request
+MAX_CONCURRENT = 2          # LLM requests in flight
+REQUESTS_PER_MINUTE = 30
+POLL_INTERVAL = 5.0         # seconds between polls when idle or making no progress
+MAX_ATTEMPTS = 3            # failed classifications before a row is given up on
+CLAIM_LEASE = 600           # seconds before another worker may take over a claimed row
+MODEL = "gpt-4o-mini"
+
+# Same wording as the classify_image edge function, asked per numbered item
+LOCATION_PROMPT = "Looking at this room, describe where the highlighted item is positioned. Reference visible landmarks, furniture, or other objects to explain its location."
+ITEM_PROMPT = "What type of item is this and what would be its current resale value? Make your best effort to identify the item even if the image quality isn't perfect. Provide a human-friendly, searchable name including the brand name if visible (e.g., 'Sony 55-inch TV', 'Nike running shoes', 'IKEA BILLY bookshelf'). Then estimate a conservative resale price in USD. Only classify as 'unknown' if it's completely impossible to make any reasonable guess about what the item is."
+BATCH_PROMPT = (
+    "You are given {count} items. Each item has a close-up crop followed by the full room photo "
+    "with the item highlighted. For every item: {item_prompt} Also: {location_prompt} "
+    "The location_description should be 20-30 words and start with 'This item is located'. "
+    "Use a price of 0 for unknown items. Return one entry per item with its index."
+)
+
+class ItemClassification(BaseModel):
+    index: int
+    item_class: str
+    approximate_price: float
+    location_description: str
+
+class BatchClassification(BaseModel):
+    items: List[ItemClassification]
+
+# -----------------------------------------------------------------------------
+# Classifiers
+# -----------------------------------------------------------------------------
+class OpenAIClassifier:
+    def __init__(self, model=MODEL, api_key=None, base_url=None):
+        from openai import OpenAI
+        self.client = OpenAI(api_key=api_key or os.getenv("OPENAI_API_KEY"), base_url=base_url)
+        self.model = model
+
+    def classify(self, items):
+        """
+        Classify several items in one request.
+        :param items: list of (partial_image_bytes, full_image_bytes)
+        :return: list of ItemClassification, one per item in order
+        """
+        content = [{"type": "text", "text": BATCH_PROMPT.format(
+            count=len(items), item_prompt=ITEM_PROMPT, location_prompt=LOCATION_PROMPT)}]
+        for i, (partial, full) in enumerate(items):
+            content.append({"type": "text", "text": f"Item {i}:"})
+            for data in (partial, full):
+                content.append({"type": "image_url", "image_url": {
+                    "url": f"data:image/jpeg;base64,{base64.b64encode(data).decode()}"}})
+
+        completion = self.client.beta.chat.completions.parse(
+            model=self.model,
+            messages=[{"role": "user", "content": content}],
+            response_format=BatchClassification,
+        )
+        by_index = {item.index: item for item in completion.choices[0].message.parsed.items}
+        missing = [i for i in range(len(items)) if i not in by_index]
+        if missing:
+            raise ValueError(f"Model skipped items {missing}")
+        return [by_index[i] for i in range(len(items))]
+
+class MockClassifier:
+    CLASSES = ["book", "bottle", "chair", "laptop", "mug", "remote"]
+
+    def __init__(self, latency=0.5):
+        """Deterministic stand-in for the LLM (same image -> same answer), for local runs."""
+        self.latency = latency
+        self.calls = 0
+
+    def classify(self, items):
+        self.calls += 1
+        time.sleep(self.latency)
+        results = []
+        for i, (partial, _) in enumerate(items):
+            h = zlib.crc32(partial)
+            results.append(ItemClassification(
+                index=i,
+                item_class=self.CLASSES[h % len(self.CLASSES)],
+                approximate_price=float(h % 200),
+                location_description="This item is located in a mocked room on a mocked shelf.",
+            ))
+        return results
+
+# -----------------------------------------------------------------------------
+# Stores
+# -----------------------------------------------------------------------------
+def timestamp(t):
+    """UTC ISO 8601 timestamp without a '+' (it would need escaping in PostgREST filters)."""
+    return datetime.fromtimestamp(t, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+class SupabaseStore:
+    def __init__(self, supabase_client):
+        self.client = supabase_client
+        self.bucket = supabase_client.storage.from_(BUCKET)
+
+    def claim(self, limit):
+        """Atomically claim up to limit unclassified, unclaimed (or lease-expired) rows and return them."""
+        now = time.time()
+        unclaimed = f"claimed_at.is.null,claimed_at.lt.{timestamp(now - CLAIM_LEASE)}"
+        candidates = (self.client.table(TABLE).select('id').is_('classified_at', 'null')
+                      .lt('classify_attempts', MAX_ATTEMPTS).or_(unclaimed)
+                      .order('created_at').limit(limit).execute().data)
+        if not candidates:
+            return []
+        # Only rows still unclaimed are updated, so two workers never claim the same row
+        return (self.client.table(TABLE).update({'claimed_at': timestamp(now)})
+                .in_('id', [row['id'] for row in candidates]).is_('classified_at', 'null')
+                .or_(unclaimed).execute().data)
+
+    def download(self, name):
+        return self.bucket.download(name)
+
+    def write_results(self, updates):
+        """Write all results, marking their rows done, with a single upsert on the primary key."""
+        if updates:
+            now = timestamp(time.time())
+            self.client.table(TABLE).upsert([dict(update, classified_at=now, claimed_at=None)
+                                             for update in updates], on_conflict='id').execute()
+
+    def release(self, rows):
+        """Count a failed attempt for each row and unclaim it, so a later poll retries it."""
+        if rows:
+            self.client.table(TABLE).upsert([
+                {'id': row['id'], 'classify_attempts': row.get('classify_attempts', 0) + 1, 'claimed_at': None}
+                for row in rows], on_conflict='id').execute()
+
+class LocalStore:
+    def __init__(self, db_path, images_dir):
+        """
+        Stand-in for Supabase: a SQLite stuff table with the same columns, and
+        the bucket as a plain directory.
+        """
+        self.images_dir = images_dir
+        self.db = sqlite3.connect(db_path, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS stuff (id TEXT PRIMARY KEY, created_at REAL DEFAULT (julianday('now')), "
+            "class TEXT DEFAULT 'unknown', approximate_price REAL, location_description TEXT, "
+            "full_image_id TEXT, partial_image_id TEXT, classified_at REAL, claimed_at REAL, "
+            "classify_attempts INTEGER NOT NULL DEFAULT 0)")
+        self.db.commit()
+        self.lock = threading.Lock()
+
+    def claim(self, limit):
+        now = time.time()
+        with self.lock:
+            rows = [dict(r) for r in self.db.execute(
+                "SELECT * FROM stuff WHERE classified_at IS NULL AND classify_attempts < ? "
+                "AND (claimed_at IS NULL OR claimed_at < ?) ORDER BY created_at LIMIT ?",
+                (MAX_ATTEMPTS, now - CLAIM_LEASE, limit))]
+            self.db.executemany("UPDATE stuff SET claimed_at = ? WHERE id = ?", [(now, r['id']) for r in rows])
+            self.db.commit()
+        return rows
+
+    def download(self, name):
+        with open(os.path.join(self.images_dir, name), 'rb') as f:
+            return f.read()
+
+    def write_results(self, updates):
+        with self.lock:
+            self.db.executemany(
+                "UPDATE stuff SET class = :class, approximate_price = :approximate_price, "
+                "location_description = :location_description, classified_at = :classified_at, "
+                "claimed_at = NULL WHERE id = :id", [dict(update, classified_at=time.time()) for update in updates])
+            self.db.commit()
+
+    def release(self, rows):
+        with self.lock:
+            self.db.executemany(
+                "UPDATE stuff SET classify_attempts = classify_attempts + 1, claimed_at = NULL WHERE id = ?",
+                [(row['id'],) for row in rows])
+            self.db.commit()
+
+# -----------------------------------------------------------------------------
+# Worker
+# -----------------------------------------------------------------------------
+class RateLimiter:
+    def __init__(self, per_minute):
+        """Token bucket allowing per_minute requests, with bursts up to the same number."""
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, float(per_minute))
+        self.tokens = self.capacity
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return
+                wait = (1.0 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class ClassificationWorker:
+    def __init__(self, store, classifier, batch_size=BATCH_SIZE, max_concurrent=MAX_CONCURRENT,
+                 requests_per_minute=REQUESTS_PER_MINUTE, cache=None):
+        """
+        :param cache: Optional ClassificationCache; crops it recognises skip the LLM entirely
+        """
+        self.store = store
+        self.classifier = classifier
+        self.batch_size = batch_size
+        self.max_concurrent = max_concurrent
+        self.cache = cache
+        self.limiter = RateLimiter(requests_per_minute)
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrent)
+        self.counts_lock = threading.Lock()
+        self.counts = {"classified": 0, "cached": 0, "failed": 0, "requests": 0}
+
+    def count(self, name, n=1):
+        with self.counts_lock:
+            self.counts[name] += n
+
+    def crop_hash(self, data):
+        try:
+            return image_phash(data)
+        except Exception:
+            return None
+
+    def classify_batch(self, rows):
+        """Download the images of rows and classify them in one request. Returns (updates, failed rows)."""
+        items, ready, hashes, updates, failed = [], [], [], [], []
+        for row in rows:
+            try:
+                partial = self.store.download(row['partial_image_id'])
+            except Exception as e:
+                print(f"Could not download images for {row['id']}: {e}")
+                failed.append(row)
+                continue
+
+            # Known items are answered from the cache without downloading the full image
+            phash = self.crop_hash(partial) if self.cache is not None else None
+            cached = self.cache.lookup(phash) if phash is not None else None
+            if cached is not None and cached['class'] != UNKNOWN:
+                # Location belongs to this sighting, so the row keeps the one it has
+                updates.append(dict(cached, id=row['id'], location_description=row.get('location_description')))
+                continue
+
+            try:
+                items.append((partial, self.store.download(row['full_image_id'])))
+            except Exception as e:
+                print(f"Could not download images for {row['id']}: {e}")
+                failed.append(row)
+                continue
+            ready.append(row)
+            hashes.append(phash)
+        self.count("cached", len(updates))
+        if not ready:
+            return updates, failed
+
+        try:
+            self.limiter.acquire()
+            self.count("requests")
+            results = self.classifier.classify(items)
+        except Exception as e:
+            print(f"Batch of {len(ready)} failed: {e}")
+            return updates, failed + ready
+
+        for row, phash, result in zip(ready, hashes, results):
+            update = {
+                'class': result.item_class,
+                'approximate_price': max(0.0, result.approximate_price),
+                'location_description': result.location_description,
+            }
+            # An 'unknown' answer is worth asking again for a different crop of the item
+            if phash is not None and result.item_class.lower() != UNKNOWN:
+                self.cache.add(phash, update)
+            updates.append(dict(update, id=row['id']))
+        return updates, failed
+
+    def run_once(self):
+        """Claim, classify and write back one round of rows. Returns (rows claimed, rows classified)."""
+        rows = self.store.claim(self.batch_size * self.max_concurrent)
+        if not rows:
+            return 0, 0
+
+        start = time.time()
+        batches = [rows[i:i + self.batch_size] for i in range(0, len(rows), self.batch_size)]
+        updates, failed = [], []
+        for batch_updates, batch_failed in self.executor.map(self.classify_batch, batches):
+            updates += batch_updates
+            failed += batch_failed
+
+        self.store.write_results(updates)
+        # Failed rows are unclaimed so a later poll retries them, up to MAX_ATTEMPTS
+        self.store.release(failed)
+        for row in failed:
+            if row.get('classify_attempts', 0) + 1 >= MAX_ATTEMPTS:
+                print(f"Giving up on {row['id']} after {MAX_ATTEMPTS} attempts")
+        if self.cache is not None:
+            self.cache.save()
+        self.count("classified", len(updates))
+        self.count("failed", len(failed))
+        print(f"Classified {len(updates)} items ({time.time() - start:.1f}s), "
+              f"{len(failed)} failed. Totals: {self.counts}")
+        return len(rows), len(updates)
+
+    def run(self, once=False):
+        try:
+            while True:
+                claimed, classified = self.run_once()
+                if once and claimed == 0:
+                    break
+                # Keep going without sleeping while a backlog is being worked through,
+                # but don't hammer the LLM with retries when every row is failing
+                if classified == 0:
+                    time.sleep(POLL_INTERVAL)
+        except KeyboardInterrupt:
+            print("\nClassification worker stopped")
+        finally:
+            self.executor.shutdown(wait=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Classify unclassified stuff rows in batches")
+    parser.add_argument("--mock", action="store_true", help="Use the mocked LLM instead of OpenAI")
+    parser.add_argument("--local", metavar="DB", help="Use a local SQLite stand-in instead of Supabase")
+    parser.add_argument("--images", default="stuff_test_images", help="Image directory for --local")
+    parser.add_argument("--once", action="store_true", help="Exit when there is nothing left to classify")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENT)
+    parser.add_argument("--rpm", type=int, default=REQUESTS_PER_MINUTE, help="LLM requests per minute")
+    parser.add_argument("--cache", default=CACHE_PATH, help="Classification cache file")
+    parser.add_argument("--no-cache", action="store_true", help="Always ask the LLM")
+    args = parser.parse_args()
+
+    if args.local:
+        store = LocalStore(args.local, args.images)
+    else:
+        from supabase import create_client
+        store = SupabaseStore(create_client(os.getenv("SUPABASE_URL", "http://127.0.0.1:54321"),
+                                            os.getenv("SUPABASE_KEY")))
+    classifier = MockClassifier() if args.mock else OpenAIClassifier()
+
+    cache = None if args.no_cache else ClassificationCache(args.cache)
+    worker = ClassificationWorker(store, classifier, args.batch_size, args.concurrency, args.rpm, cache)
+    worker.run(once=args.once)
+
+if __name__ == "__main__":
+    main()
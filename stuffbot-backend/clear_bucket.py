@@ -1,30 +1,158 @@
 from supabase import create_client
-from typing import Tuple
+from typing import List, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+import argparse
+import os
+import time
 
-def clear_stuff_bucket(supabase_client) -> Tuple[bool, str]:
+BUCKET = 'stuff_images_bucket'
+TABLE = 'stuff'
+PAGE_SIZE = 1000        # objects/rows fetched per list or select call
+DELETE_BATCH = 100      # names per remove() call
+DELETE_WORKERS = 8      # remove() calls in flight at once
+ORPHAN_MIN_AGE = 600    # seconds; younger objects may still be waiting for their row
+
+def list_all_objects(supabase_client) -> List[dict]:
+    """Every object in the bucket, fetched page by page (list() alone returns one page)."""
+    bucket = supabase_client.storage.from_(BUCKET)
+    objects = []
+    offset = 0
+    while True:
+        page = bucket.list("", {"limit": PAGE_SIZE, "offset": offset, "sortBy": {"column": "name", "order": "asc"}})
+        # Folder placeholders have no id
+        objects.extend(obj for obj in page if obj.get('id') is not None)
+        if len(page) < PAGE_SIZE:
+            return objects
+        offset += PAGE_SIZE
+
+def list_all_rows(supabase_client) -> List[dict]:
+    """Image ids and creation time of every stuff row, fetched page by page."""
+    rows = []
+    start = 0
+    while True:
+        page = (supabase_client.table(TABLE).select('full_image_id, partial_image_id, created_at')
+                .range(start, start + PAGE_SIZE - 1).execute().data)
+        rows.extend(page)
+        if len(page) < PAGE_SIZE:
+            return rows
+        start += PAGE_SIZE
+
+def batched(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def run_batches(label, batches, delete_fn, workers=DELETE_WORKERS) -> Tuple[int, List[str]]:
+    """Run delete_fn over batches in parallel, printing progress and throughput."""
+    total = sum(len(batch) for batch in batches)
+    done = 0
+    errors = []
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(delete_fn, batch): batch for batch in batches}
+        for future in as_completed(futures):
+            try:
+                future.result()
+                done += len(futures[future])
+            except Exception as e:
+                errors.append(str(e))
+            elapsed = max(time.time() - start, 1e-6)
+            print(f"{label}: {done}/{total} deleted ({done / elapsed:.0f}/s)")
+    return done, errors
+
+def delete_objects(supabase_client, names, batch_size=DELETE_BATCH, workers=DELETE_WORKERS) -> Tuple[int, List[str]]:
+    bucket = supabase_client.storage.from_(BUCKET)
+    return run_batches("objects", batched(names, batch_size), bucket.remove, workers)
+
+def delete_rows(supabase_client, full_image_ids, batch_size=DELETE_BATCH, workers=DELETE_WORKERS) -> Tuple[int, List[str]]:
+    def delete_batch(ids):
+        supabase_client.table(TABLE).delete().in_('full_image_id', ids).execute()
+    return run_batches("rows", batched(full_image_ids, batch_size), delete_batch, workers)
+
+def object_age(obj, now) -> float:
+    """Seconds since the object (or row) was created, or 0 if unknown (treated as too new to touch)."""
+    try:
+        created = datetime.fromisoformat(obj['created_at'].replace('Z', '+00:00'))
+    except (KeyError, TypeError, ValueError):
+        return 0.0
+    return (now - created).total_seconds()
+
+def clear_stuff_bucket(supabase_client, batch_size=DELETE_BATCH, workers=DELETE_WORKERS) -> Tuple[bool, str]:
     """
-    Clears all images from the stuff_images_bucket in both 'full' and 'partial' folders.
-    
+    Clears all images from the stuff_images_bucket, however many pages it holds.
+
     Args:
         supabase_client: Initialized Supabase client
-        
+        batch_size: Names per remove() call
+        workers: remove() calls in flight at once
+
     Returns:
         Tuple[bool, str]: (success, error_message)
     """
     print("Clearing stuff bucket")
     try:
-        # List all files in the bucket
-        response = supabase_client.storage.from_('stuff_images_bucket').list()
-        file_names = [file['name'] for file in response]
-        
+        # List everything first; deleting while paging would shift the offsets
+        file_names = [obj['name'] for obj in list_all_objects(supabase_client)]
+
         # Delete all files if any exist
-        if file_names:
-            supabase_client.storage.from_('stuff_images_bucket').remove(file_names)
-            print(f"Deleted {len(file_names)} files")
-        else:
+        if not file_names:
             print("Bucket is already empty")
-            
-        return True, ""
-        
+            return True, ""
+
+        deleted, errors = delete_objects(supabase_client, file_names, batch_size, workers)
+        print(f"Deleted {deleted} files")
+        return not errors, "; ".join(errors)
+
+    except Exception as e:
+        return False, str(e)
+
+def prune_orphans(supabase_client, dry_run=False, min_age=ORPHAN_MIN_AGE,
+                  batch_size=DELETE_BATCH, workers=DELETE_WORKERS) -> Tuple[bool, str]:
+    """
+    Delete stuff rows whose images are gone, and objects no row refers to.
+    Rows and objects younger than min_age are left alone, since an upload may still be in progress.
+    """
+    print("Pruning orphans")
+    try:
+        # Rows first: objects always go up before their row, so every listed row's
+        # objects are already in the object listing that follows
+        rows = list_all_rows(supabase_client)
+        objects = list_all_objects(supabase_client)
+        object_names = {obj['name'] for obj in objects}
+        referenced = {row['full_image_id'] for row in rows} | {row['partial_image_id'] for row in rows}
+
+        now = datetime.now(timezone.utc)
+        orphan_rows = [row['full_image_id'] for row in rows
+                       if (row['full_image_id'] not in object_names or row['partial_image_id'] not in object_names)
+                       and object_age(row, now) >= min_age]
+        orphan_objects = [obj['name'] for obj in objects
+                          if obj['name'] not in referenced and object_age(obj, now) >= min_age]
+        print(f"{len(objects)} objects, {len(rows)} rows: "
+              f"{len(orphan_rows)} orphaned rows, {len(orphan_objects)} orphaned objects")
+        if dry_run:
+            return True, ""
+
+        errors = []
+        if orphan_rows:
+            errors += delete_rows(supabase_client, orphan_rows, batch_size, workers)[1]
+        if orphan_objects:
+            errors += delete_objects(supabase_client, orphan_objects, batch_size, workers)[1]
+        return not errors, "; ".join(errors)
+
     except Exception as e:
         return False, str(e)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk maintenance for the stuff bucket")
+    parser.add_argument("--prune", action="store_true", help="Prune orphaned rows/objects instead of clearing")
+    parser.add_argument("--dry-run", action="store_true", help="With --prune, only report what would be deleted")
+    parser.add_argument("--batch-size", type=int, default=DELETE_BATCH)
+    parser.add_argument("--workers", type=int, default=DELETE_WORKERS)
+    args = parser.parse_args()
+
+    client = create_client(os.getenv("SUPABASE_URL", "http://127.0.0.1:54321"), os.getenv("SUPABASE_KEY"))
+    if args.prune:
+        success, error = prune_orphans(client, dry_run=args.dry_run, batch_size=args.batch_size, workers=args.workers)
+    else:
+        success, error = clear_stuff_bucket(client, args.batch_size, args.workers)
+    if not success:
+        print(f"Failed: {error}")
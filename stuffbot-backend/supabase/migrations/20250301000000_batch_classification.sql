@@ -0,0 +1,17 @@
+-- Classification now runs in batches in classify_worker.py instead of one
+-- classify_image webhook call per inserted row
+drop trigger if exists classify_stuff_images_webhook on stuff;
+
+-- The worker's queue state lives in its own columns rather than the class
+-- value, so an LLM answer of 'unknown' is final, failing rows are given up on
+-- after a few attempts, and claims of a crashed worker expire
+alter table stuff add column if not exists classified_at timestamp with time zone;
+alter table stuff add column if not exists claimed_at timestamp with time zone;
+alter table stuff add column if not exists classify_attempts integer not null default 0;
+
+-- Rows classified by the webhook are done
+update stuff set classified_at = coalesce(created_at, now())
+    where classified_at is null and class <> 'unknown';
+
+-- The worker polls for rows that still need classifying, oldest first
+create index if not exists stuff_unclassified_created_at_idx on stuff (created_at) where classified_at is null;
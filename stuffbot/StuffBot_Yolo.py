@@ -1,11 +1,15 @@
 import cv2
 from ultralytics import YOLO
 import uuid
+import sys
 import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 import datetime
 import threading
 from queue import Queue
 import time
+from lib.frame_ring import SharedCamera
+from detection_filters import DEFAULT_DENY_CLASSES, PRIVACY_CLASS, resolve_class_ids, class_id, blur_regions
 
 class ObjectTracker:
     _instance = None
@@ -25,18 +29,23 @@ class ObjectTracker:
                 os.makedirs(cls._instance.output_dir, exist_ok=True)
         return cls._instance
 
-    def __init__(self, model_path="yolov8n.pt", display_enabled=False, conf_threshold=0.5, save_images=True):
+    def __init__(self, model_path="yolov8n.pt", display_enabled=False, conf_threshold=0.5, save_images=True,
+                 allow_classes=None, deny_classes=DEFAULT_DENY_CLASSES, blur_people=False):
         """Initialize StuffBot with YOLO model and webcam"""
         self.model = YOLO(model_path)
-        self.camera = cv2.VideoCapture(0)
-        
-        # Set camera resolution explicitly
-        self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+
+        # Class filtering happens inside inference; people are only detected to be blurred
+        self.track_class_ids = resolve_class_ids(self.model.names, allow_classes, deny_classes)
+        self.privacy_class_id = class_id(self.model.names, PRIVACY_CLASS) if blur_people else None
+        self.inference_classes = self.track_class_ids
+        if self.inference_classes is not None and self.privacy_class_id is not None:
+            self.inference_classes = sorted(set(self.inference_classes) | {self.privacy_class_id})
+
+        # Frames come from core/node_camera.py
+        self.camera = SharedCamera()
         
         # Verify the actual resolution being used
-        actual_width = self.camera.get(cv2.CAP_PROP_FRAME_WIDTH)
-        actual_height = self.camera.get(cv2.CAP_PROP_FRAME_HEIGHT)
+        actual_height, actual_width = self.camera.ring.shape[:2]
         print(f"Camera resolution: {actual_width}x{actual_height}")
         
         self.display_enabled = display_enabled
@@ -92,14 +101,19 @@ class ObjectTracker:
         if not success:
             return None, []
 
+        # Run YOLOv8 inference with confidence threshold
+        results = self.model(frame, conf=self.conf_threshold, classes=self.inference_classes)
+        boxes = results[0].boxes.data.cpu().numpy().tolist()
+
+        # Blur people out of everything that gets saved, in one pass
+        privacy_boxes = [b[:4] for b in boxes if int(b[5]) == self.privacy_class_id]
+        saved_frame = blur_regions(frame.copy(), privacy_boxes) if self.save_images and privacy_boxes else frame
+
         # Save vanilla frame only if save_images is True
         if self.save_images:
             timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
             vanilla_filename = f"image_{timestamp}.jpg"
-            cv2.imwrite(os.path.join(self.output_dir, vanilla_filename), frame)
-
-        # Run YOLOv8 inference with confidence threshold
-        results = self.model(frame, conf=self.conf_threshold)
+            cv2.imwrite(os.path.join(self.output_dir, vanilla_filename), saved_frame)
         
         # Create a separate frame for display
         display_frame = frame.copy() if self.display_enabled else None
@@ -107,13 +121,11 @@ class ObjectTracker:
         detections = []
         
         # Process each detection
-        for result in results[0].boxes.data:
-            x1, y1, x2, y2, conf, class_id = result
-            class_name = self.model.names[int(class_id)]
-            
-            # Skip if the detected object is a person
-            if class_name.lower() == 'person':
+        for x1, y1, x2, y2, conf, cls in boxes:
+            cls = int(cls)
+            if self.track_class_ids is not None and cls not in self.track_class_ids:
                 continue
+            class_name = self.model.names[cls]
             
             # Generate or retrieve object ID
             detection_key = f"{class_name}_{int(x1)}_{int(y1)}"
@@ -124,7 +136,7 @@ class ObjectTracker:
             # Save detection images only if save_images is True
             if self.save_images:
                 full_image, cropped_image = self.save_detection_images(
-                    frame.copy(),
+                    saved_frame,
                     [x1, y1, x2, y2], 
                     class_name, 
                     object_id
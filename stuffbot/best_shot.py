@@ -0,0 +1,110 @@
+import math
+import cv2
+import numpy as np
+from detection_filters import blur_regions
+
+# Score weights; each term is normalised to 0-1
+SHARPNESS_WEIGHT = 0.4
+SIZE_WEIGHT = 0.2
+CONFIDENCE_WEIGHT = 0.2
+CENTRALITY_WEIGHT = 0.2
+SHARPNESS_REF = 300.0   # Laplacian variance treated as "fully sharp"
+SIZE_REF = 0.25         # box covering this fraction of the frame gets the full size score
+MATURE_HITS = 10        # emit a long-lived track's best shot after this many sightings
+PADDING = 20            # pixels added around the box for the crop
+
+class BestShot:
+    def __init__(self, track, frame, score, privacy_boxes=()):
+        # The shot owns its frame buffer; later, better sightings are copied into it in place
+        self.frame = frame.copy()
+        self.set(track, self.frame, score, privacy_boxes)
+
+    def set(self, track, frame, score, privacy_boxes=()):
+        if frame is not self.frame:
+            np.copyto(self.frame, frame)
+        # Blur people in our copy only, so the live frame is left untouched
+        blur_regions(self.frame, privacy_boxes)
+        self.object_id = track.track_id
+        self.class_name = track.class_name
+        self.confidence = track.confidence
+        self.box = tuple(track.box)
+        self.score = score
+
+    def padded_box(self):
+        height, width = self.frame.shape[:2]
+        x1, y1, x2, y2 = map(int, self.box)
+        return (max(0, x1 - PADDING), max(0, y1 - PADDING),
+                min(width, x2 + PADDING), min(height, y2 + PADDING))
+
+    def render(self):
+        """
+        (full frame with the padded box drawn, padded crop), both backed by the
+        shot's own buffer. The box is drawn just outside the crop region, so the
+        crop stays a clean view and nothing is copied.
+        """
+        x1, y1, x2, y2 = self.padded_box()
+        cv2.rectangle(self.frame, (x1 - 2, y1 - 2), (x2 + 1, y2 + 1), (0, 255, 0), 2)
+        cv2.putText(self.frame, self.class_name, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+        return self.frame, self.frame[y1:y2, x1:x2]
+
+class BestShotSelector:
+    def __init__(self, mature_hits=MATURE_HITS):
+        """
+        Keep the best-looking frame of every track and hand it out exactly once,
+        when the track matures (mature_hits sightings) or ends, whichever is first.
+        """
+        self.mature_hits = mature_hits
+        self.best = {}        # track id -> BestShot
+        self.emitted = set()  # track ids whose shot has been handed out
+
+    def score(self, frame, box, confidence):
+        height, width = frame.shape[:2]
+        x1, y1, x2, y2 = (int(round(v)) for v in box)
+        x1, y1, x2, y2 = max(0, x1), max(0, y1), min(width, x2), min(height, y2)
+        if x2 <= x1 or y2 <= y1:
+            return 0.0
+
+        # cvtColor allocates only a crop-sized grey image; the crop itself is a view
+        grey = cv2.cvtColor(frame[y1:y2, x1:x2], cv2.COLOR_BGR2GRAY)
+        sharpness = min(cv2.Laplacian(grey, cv2.CV_64F).var() / SHARPNESS_REF, 1.0)
+        size = min((x2 - x1) * (y2 - y1) / (width * height * SIZE_REF), 1.0)
+        cx, cy = (x1 + x2) / 2, (y1 + y2) / 2
+        centrality = 1.0 - math.hypot(cx / width - 0.5, cy / height - 0.5) / math.hypot(0.5, 0.5)
+        return (SHARPNESS_WEIGHT * sharpness + SIZE_WEIGHT * size +
+                CONFIDENCE_WEIGHT * confidence + CENTRALITY_WEIGHT * centrality)
+
+    def offer(self, track, frame, privacy_boxes=()):
+        """
+        Score this sighting of a track and remember it if it beats the previous best.
+        :param privacy_boxes: Regions (people) to blur if this frame is kept
+        """
+        if track.track_id in self.emitted:
+            return
+        score = self.score(frame, track.box, track.confidence)
+        best = self.best.get(track.track_id)
+        if best is None:
+            self.best[track.track_id] = BestShot(track, frame, score, privacy_boxes)
+        elif score > best.score and frame.shape == best.frame.shape:
+            # Only copy the frame when it becomes the best one, into the buffer we already have
+            best.set(track, frame, score, privacy_boxes)
+
+    def collect(self, tracks, removed):
+        """
+        Shots ready to persist: matured live tracks and tracks that just ended.
+        :param tracks: Tracks alive in the tracker
+        :param removed: Tracks evicted by the latest tracker update
+        """
+        ready = []
+        for track in tracks:
+            if track.hits >= self.mature_hits and track.track_id in self.best:
+                ready.append(self.pop(track.track_id))
+        for track in removed:
+            if track.track_id in self.best:
+                ready.append(self.pop(track.track_id))
+            # Evicted ids never come back, so stop remembering them
+            self.emitted.discard(track.track_id)
+        return ready
+
+    def pop(self, track_id):
+        self.emitted.add(track_id)
+        return self.best.pop(track_id)
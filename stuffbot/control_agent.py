@@ -1,17 +1,71 @@
 from pydantic import BaseModel
 from openai import OpenAI
 import base64
+import json
 import os
+import threading
+import time
+import cv2
+import numpy as np
 from prompts import RobotMode, MovementCommand, get_system_prompt, get_mode_prompt
 
+# Request size. Gemini bills an image as 258 tokens per 768x768 tile, so frames
+# are shrunk to fit one tile; extra pixels only add latency and tokens.
+MAX_IMAGE_SIZE = 768        # longest side sent to the model, in pixels
+JPEG_QUALITY = 70           # plenty for steering decisions, about half the bytes of the default 95
+HISTORY_THUMBNAIL_SIZE = 0  # longest side of history images; 0 replaces them with a text note
+
+# Request timing. A command that arrives after the deadline is useless to a
+# moving robot, so the robot falls back to stopping instead of waiting.
+REQUEST_DEADLINE = 2.0      # seconds from submit to a usable command
+
 class RobotState(BaseModel):
     current_linear_velocity: float
     current_angular_velocity: float
 
+class ControlRequest:
+    """One in-flight LLM control request, running on its own thread."""
+    def __init__(self, lock, on_velocity=None):
+        """
+        :param lock: The agent's lock; cancelling and committing results happen under it too
+        """
+        self.lock = lock
+        self.on_velocity = on_velocity
+        self.cancelled = threading.Event()
+        self.done = threading.Event()
+        self.velocity = None    # (linear, angular) as soon as both fields have streamed in
+        self.result = None      # MovementCommand once the whole response is parsed
+        self.error = None
+        self.submitted = time.time()
+
+    def cancel(self):
+        """Stop reading the response; the stream is closed at the next chunk."""
+        self.cancelled.set()
+
+    def wait(self, timeout=None):
+        """MovementCommand, or None if the request failed, was cancelled or isn't done within timeout."""
+        self.done.wait(timeout)
+        return self.result
+
+    def set_velocity(self, parsed):
+        # Fields stream in schema order, so once description has started both
+        # velocities are complete (a number still streaming could be truncated)
+        if self.velocity is not None or not parsed or "description" not in parsed:
+            return
+        self.velocity = (float(parsed["linear_velocity"]), float(parsed["angular_velocity"]))
+        # Under the lock, so a caller that has cancelled (and sent its fallback) never
+        # sees a stale velocity published after it
+        with self.lock:
+            if self.on_velocity and not self.cancelled.is_set():
+                self.on_velocity(*self.velocity)
+
 class ControlAgent:
     def __init__(self):
         self.current_mode = RobotMode.LOOK_FOR_TABLE
         self.chat_history = ChatHistory()
+        self.last_request_stats = {}
+        self.lock = threading.Lock()
+        self.in_flight = None
         # self.client = OpenAI()
         self.client = OpenAI(
             api_key=os.getenv("GEMINI_API_KEY"),
@@ -19,66 +73,143 @@ class ControlAgent:
         )
         self.model_name = "gemini-2.0-flash-lite-preview-02-05"
 
-    def get_movement_command(self, image_data, robot_state: RobotState, is_path=False, history_length=1) -> MovementCommand:
-        # Handle both file paths and image bytes
+    def get_movement_command(self, image_data, robot_state: RobotState, is_path=False, history_length=1,
+                             deadline=REQUEST_DEADLINE, on_velocity=None) -> MovementCommand:
+        """
+        Ask the LLM for a movement command, waiting at most deadline seconds.
+        On timeout or error the request is cancelled and a stop command is returned.
+        :param on_velocity: called with (linear, angular) as soon as they stream in, before the full reply
+        """
+        request = self.submit(image_data, robot_state, is_path, history_length, on_velocity, deadline)
+        request.wait(deadline)
+        # Cancel or accept atomically: run_request commits its result under the same lock,
+        # so a reply landing right at the deadline is either used or fully discarded
+        with self.lock:
+            movement_command = request.result
+            if movement_command is None:
+                request.cancel()
+        if movement_command is None:
+            reason = request.error or f"no reply within {deadline:.1f}s"
+            print(f"LLM control request failed: {reason}")
+            return self.fallback_command(reason)
+        return movement_command
+
+    def submit(self, image_data, robot_state: RobotState, is_path=False, history_length=1,
+               on_velocity=None, deadline=REQUEST_DEADLINE) -> ControlRequest:
+        """
+        Start a control request in the background and return it without waiting.
+        A request still in flight is cancelled, since its frame is now out of date.
+        :param deadline: Seconds the HTTP request may take before it is abandoned
+        """
+        # Handle file paths, encoded image bytes and BGR frames
         if is_path:
-            base64_image = encode_image(image_data)
-        else:
-            base64_image = encode_image_bytes(image_data)
+            with open(image_data, "rb") as image_file:
+                image_data = image_file.read()
+        jpeg_bytes, image_size = prepare_image(image_data)
+        base64_image = encode_image_bytes(jpeg_bytes)
 
-        # Get the base system prompt and the current state-specific prompt
-        system_prompt = get_system_prompt() + "\n\n" + get_mode_prompt(self.current_mode)
+        # Mode and history are updated by run_request, so read them under the lock
+        with self.lock:
+            # Get the base system prompt and the current state-specific prompt
+            system_prompt = get_system_prompt() + "\n\n" + get_mode_prompt(self.current_mode)
 
-        user_content = [
-            {
-                "type": "text",
-                "text": f"""Current robot state:
+            user_content = [
+                {
+                    "type": "text",
+                    "text": f"""Current robot state:
                 - Linear velocity: {robot_state.current_linear_velocity:.2f} m/s
                 - Angular velocity: {robot_state.current_angular_velocity:.2f} rad/s
                 - Current mode: {self.current_mode.name}
 
                 Analyze this image and provide updated movement commands for the robot based on the current mode.
                 Follow the mode-specific objectives and transition rules."""
-            },
-            {
-                "type": "image_url",
-                "image_url": {
-                    "url": f"data:image/jpeg;base64,{base64_image}"
+                },
+                {
+                    "type": "image_url",
+                    "image_url": {
+                        "url": f"data:image/jpeg;base64,{base64_image}"
+                    }
                 }
-            }
-        ]
-
-        # Get messages including chat history if enabled
-        if history_length > 0:
-            # Set the max_messages to match history_length
-            self.chat_history.max_messages = history_length
-            messages = self.chat_history.get_messages_for_prompt(system_prompt, user_content)
-        else:
-            messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_content}
             ]
 
-        completion = self.client.beta.chat.completions.parse(
-            model=self.model_name,
-            messages=messages,
-            response_format=MovementCommand,
-            max_tokens=1000,
-        )
+            # Get messages including chat history if enabled
+            if history_length > 0:
+                # Set the max_messages to match history_length
+                self.chat_history.max_messages = history_length
+                messages = self.chat_history.get_messages_for_prompt(system_prompt, user_content)
+            else:
+                messages = [
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_content}
+                ]
 
-        # Get the parsed response
-        movement_command = completion.choices[0].message.parsed
-        
-        # Update the mode based on the LLM's decision
-        self.current_mode = movement_command.next_mode
-        
-        self.chat_history.add_exchange(system_prompt, user_content, movement_command)
-        
-        return movement_command
+            request = ControlRequest(self.lock, on_velocity)
+            if self.in_flight is not None:
+                self.in_flight.cancel()
+            self.in_flight = request
+        threading.Thread(target=self.run_request,
+                         args=(request, messages, system_prompt, user_content, jpeg_bytes, image_size, deadline),
+                         daemon=True).start()
+        return request
+
+    def run_request(self, request, messages, system_prompt, user_content, jpeg_bytes, image_size, deadline):
+        try:
+            with self.client.beta.chat.completions.stream(
+                model=self.model_name,
+                messages=messages,
+                response_format=MovementCommand,
+                max_tokens=1000,
+                timeout=deadline,
+            ) as stream:
+                for event in stream:
+                    if request.cancelled.is_set():
+                        return  # leaving the block closes the connection
+                    if event.type == "content.delta":
+                        request.set_velocity(event.parsed)
+                completion = stream.get_final_completion()
+
+            self.last_request_stats = request_stats(messages, jpeg_bytes, image_size, completion)
+            self.last_request_stats["latency"] = time.time() - request.submitted
+            print(format_request_stats(self.last_request_stats))
+
+            # Get the parsed response
+            movement_command = completion.choices[0].message.parsed
+
+            with self.lock:
+                # A superseded request must not move the state machine or history
+                if request.cancelled.is_set():
+                    return
+                # Update the mode based on the LLM's decision
+                self.current_mode = movement_command.next_mode
+                self.chat_history.add_exchange(system_prompt, user_content, movement_command)
+                request.result = movement_command
+        except Exception as e:
+            request.error = str(e)
+        finally:
+            request.done.set()
+            with self.lock:
+                if self.in_flight is request:
+                    self.in_flight = None
+
+    def cancel(self):
+        """Cancel the request in flight, if any."""
+        with self.lock:
+            if self.in_flight is not None:
+                self.in_flight.cancel()
+
+    def fallback_command(self, reason) -> MovementCommand:
+        """Safe local policy when the LLM can't answer in time: stop and stay in the current mode."""
+        return MovementCommand(
+            linear_velocity=0.0,
+            angular_velocity=0.0,
+            description=f"STOP: {reason}",
+            next_mode=self.current_mode
+        )
 
 class ChatHistory:
-    def __init__(self, max_messages=3):
+    def __init__(self, max_messages=3, thumbnail_size=HISTORY_THUMBNAIL_SIZE):
         self.max_messages = max_messages
+        self.thumbnail_size = thumbnail_size
         self.messages = []
 
     def add_exchange(self, system_prompt, user_content, assistant_response):
@@ -90,10 +221,10 @@ class ChatHistory:
             "next_mode": assistant_response.next_mode.name
         }
 
-        # Add the new exchange
+        # Add the new exchange, with its image made compact for resending
         exchange = {
             "system": system_prompt,
-            "user": user_content,
+            "user": self.compact_content(user_content),
             "assistant": assistant_dict
         }
         self.messages.append(exchange)
@@ -104,6 +235,30 @@ class ChatHistory:
         if len(self.messages) > self.max_messages:
             self.messages.pop(0)
 
+    def compact_content(self, user_content):
+        """
+        Shrink the images in a user message before it is kept as history. Earlier
+        frames matter far less than the current one, and the assistant reply stored
+        alongside already describes what was seen.
+        """
+        compact = []
+        for part in user_content:
+            if part["type"] != "image_url":
+                compact.append(part)
+            elif self.thumbnail_size:
+                data = base64.b64decode(part["image_url"]["url"].split(",", 1)[1])
+                thumbnail, _ = prepare_image(data, self.thumbnail_size, quality=50)
+                compact.append({
+                    "type": "image_url",
+                    "image_url": {"url": f"data:image/jpeg;base64,{encode_image_bytes(thumbnail)}"}
+                })
+            else:
+                compact.append({
+                    "type": "text",
+                    "text": "[Earlier camera frame omitted; see your reply below for what it showed.]"
+                })
+        return compact
+
     def get_messages_for_prompt(self, system_prompt, new_user_content):
         # Start with the system message
         messages = [{"role": "system", "content": system_prompt}]
@@ -144,4 +299,43 @@ def encode_image(image_path):
         return base64.b64encode(image_file.read()).decode('utf-8')
 
 def encode_image_bytes(image_bytes):
-    return base64.b64encode(image_bytes).decode('utf-8')
\ No newline at end of file
+    return base64.b64encode(image_bytes).decode('utf-8')
+
+def prepare_image(image, max_size=MAX_IMAGE_SIZE, quality=JPEG_QUALITY):
+    """
+    Downsize an image to the model's working resolution and JPEG-encode it.
+    :param image: BGR frame (preferred, encoded only once) or encoded image bytes
+    :return: (JPEG bytes, (width, height))
+    """
+    encoded = None
+    if not isinstance(image, np.ndarray):
+        encoded = bytes(image)
+        image = cv2.imdecode(np.frombuffer(encoded, np.uint8), cv2.IMREAD_COLOR)
+    height, width = image.shape[:2]
+    scale = max_size / max(height, width)
+    if scale >= 1 and encoded is not None and encoded[:3] == b"\xff\xd8\xff":
+        # Already a small enough JPEG; re-encoding would only add compression loss
+        return encoded, (width, height)
+    if scale < 1:
+        width, height = round(width * scale), round(height * scale)
+        image = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+    _, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return buffer.tobytes(), (width, height)
+
+def request_stats(messages, jpeg_bytes, image_size, completion=None):
+    """Size of a control request: payload bytes, image bytes and resolution, and billed tokens."""
+    usage = getattr(completion, "usage", None)
+    return {
+        "request_bytes": len(json.dumps(messages)),
+        "image_bytes": len(jpeg_bytes),
+        "image_size": image_size,
+        "prompt_tokens": getattr(usage, "prompt_tokens", None),
+        "completion_tokens": getattr(usage, "completion_tokens", None),
+    }
+
+def format_request_stats(stats):
+    width, height = stats["image_size"]
+    tokens = f"  tokens={stats['prompt_tokens']}+{stats['completion_tokens']}" if stats["prompt_tokens"] else ""
+    latency = f"  {stats['latency']:.2f}s" if "latency" in stats else ""
+    return (f"LLM request: {stats['request_bytes'] / 1024:.1f} KB  "
+            f"image {width}x{height} {stats['image_bytes'] / 1024:.1f} KB{tokens}{latency}")
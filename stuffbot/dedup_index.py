@@ -0,0 +1,134 @@
+import os
+import sqlite3
+import threading
+import time
+import cv2
+import numpy as np
+
+# -----------------------------------------------------------------------------
+# Upload dedup index
+# -----------------------------------------------------------------------------
+# Each uploaded crop is recorded with its 64-bit perceptual hash (DCT pHash),
+# track id and class. A new crop counts as a duplicate if its track was already
+# uploaded, or if a crop of the same class is within HAMMING_THRESHOLD bits.
+# Duplicates are merged into the existing entry (sightings, last_seen) instead
+# of being uploaded and classified again.
+INDEX_PATH = os.path.expanduser("~/stuffbot_spool/dedup.db")
+HAMMING_THRESHOLD = 8   # of 64 bits; lower is stricter
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS uploaded (
+    phash INTEGER NOT NULL,
+    track_id TEXT,
+    class_name TEXT NOT NULL,
+    upload_key TEXT NOT NULL,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    sightings INTEGER NOT NULL DEFAULT 1
+)
+"""
+
+def phash(image):
+    """64-bit DCT perceptual hash of an image, as a Python int."""
+    grey = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    small = cv2.resize(grey, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:8, :8].flatten()
+    # Compare against the median of the low frequencies, ignoring the DC term
+    bits = low > np.median(low[1:])
+    return int(np.packbits(bits).view(">u8")[0])
+
+def to_signed(value):
+    """SQLite integers are signed 64-bit."""
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+class DedupIndex:
+    def __init__(self, path=INDEX_PATH, threshold=HAMMING_THRESHOLD):
+        self.threshold = threshold
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(SCHEMA)
+        self.db.commit()
+        self.lock = threading.Lock()
+
+        # Hashes are compared in memory, one vectorised XOR + popcount per lookup
+        rows = self.db.execute("SELECT rowid, phash, track_id, class_name, upload_key FROM uploaded").fetchall()
+        self.rowids = [r[0] for r in rows]
+        self.hashes = np.array([r[1] for r in rows], dtype=np.int64).view(np.uint64)
+        self.track_ids = {r[2]: i for i, r in enumerate(rows) if r[2]}
+        self.classes = np.array([r[3] for r in rows], dtype=object)
+        self.keys = [r[4] for r in rows]
+        self.counts = {"checked": 0, "duplicates": 0}
+
+    def nearest(self, value, class_name):
+        """(index, distance) of the closest hash of the same class, or (None, None)."""
+        if len(self.hashes) == 0:
+            return None, None
+        xor = self.hashes ^ np.uint64(value)
+        distances = np.unpackbits(xor.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+        distances[self.classes != class_name] = 65
+        i = int(np.argmin(distances))
+        return (i, int(distances[i])) if distances[i] <= 64 else (None, None)
+
+    def match(self, crop, track_id, class_name):
+        """
+        Look a crop up before uploading it. A duplicate is merged into its entry.
+        :return: (phash, upload key of the existing duplicate or None)
+        """
+        value = phash(crop)
+        with self.lock:
+            self.counts["checked"] += 1
+            i = self.track_ids.get(track_id) if track_id else None
+            if i is None:
+                i, distance = self.nearest(value, class_name)
+                if i is not None and distance > self.threshold:
+                    i = None
+            if i is None:
+                return value, None
+
+            self.counts["duplicates"] += 1
+            self.db.execute("UPDATE uploaded SET sightings = sightings + 1, last_seen = ? WHERE rowid = ?",
+                            (time.time(), self.rowids[i]))
+            self.db.commit()
+            return value, self.keys[i]
+
+    def add(self, value, track_id, class_name, upload_key):
+        """Record a crop that is being uploaded."""
+        now = time.time()
+        with self.lock:
+            cursor = self.db.execute(
+                "INSERT INTO uploaded (phash, track_id, class_name, upload_key, first_seen, last_seen) "
+                "VALUES (?, ?, ?, ?, ?, ?)", (to_signed(value), track_id, class_name, upload_key, now, now))
+            self.db.commit()
+            self.rowids.append(cursor.lastrowid)
+            self.hashes = np.append(self.hashes, np.uint64(value))
+            self.classes = np.append(self.classes, np.array([class_name], dtype=object))
+            self.keys.append(upload_key)
+            if track_id:
+                self.track_ids[track_id] = len(self.keys) - 1
+
+    def remove(self, upload_key):
+        """Forget the entries of an upload that will never happen, so the object can be uploaded again."""
+        with self.lock:
+            indices = [i for i, key in enumerate(self.keys) if key == upload_key]
+            if not indices:
+                return
+            self.db.execute("DELETE FROM uploaded WHERE upload_key = ?", (upload_key,))
+            self.db.commit()
+            keep = np.ones(len(self.keys), dtype=bool)
+            keep[indices] = False
+            # Positions shift, so the track lookup is rebuilt from the surviving entries
+            new_index = np.cumsum(keep) - 1
+            self.track_ids = {track_id: int(new_index[i]) for track_id, i in self.track_ids.items() if keep[i]}
+            self.rowids = [r for r, k in zip(self.rowids, keep) if k]
+            self.hashes = self.hashes[keep]
+            self.classes = self.classes[keep]
+            self.keys = [key for key, k in zip(self.keys, keep) if k]
+
+    def format_counts(self):
+        with self.lock:
+            checked, duplicates = self.counts["checked"], self.counts["duplicates"]
+        return f"  dedup      checked={checked}  duplicates skipped={duplicates}  indexed={len(self.keys)}"
+
+    def close(self):
+        with self.lock:
+            self.db.close()
@@ -0,0 +1,52 @@
+import cv2
+import numpy as np
+
+# Never stored or uploaded as "stuff"
+DEFAULT_DENY_CLASSES = ("person",)
+PRIVACY_CLASS = "person"
+BLUR_DOWNSCALE = 16  # blur by shrinking this much and scaling back up (much cheaper than a big kernel)
+
+def resolve_class_ids(names, allow=None, deny=DEFAULT_DENY_CLASSES):
+    """
+    Class ids to pass to YOLO as classes=, so NMS never considers anything else.
+    :param names: The model's {id: name} mapping
+    :param allow: Class names to keep, or None for all classes
+    :param deny: Class names to drop (applied after allow)
+    :return: Sorted list of ids, or None if no filtering is needed
+    """
+    allow = {c.lower() for c in allow} if allow is not None else None
+    deny = {c.lower() for c in deny or ()}
+    unknown = (allow or set()) - {n.lower() for n in names.values()}
+    if unknown:
+        raise ValueError(f"Unknown class names: {sorted(unknown)}")
+
+    ids = [i for i, n in names.items()
+           if (allow is None or n.lower() in allow) and n.lower() not in deny]
+    return None if len(ids) == len(names) else sorted(ids)
+
+def class_id(names, name):
+    """Id of a class name in the model's mapping, or None."""
+    for i, n in names.items():
+        if n.lower() == name.lower():
+            return i
+    return None
+
+def blur_regions(image, boxes):
+    """
+    Blur every x1, y1, x2, y2 box in image, in place, with one mask and one copy.
+    Returns the image for convenience.
+    """
+    if len(boxes) == 0:
+        return image
+    height, width = image.shape[:2]
+    mask = np.zeros((height, width), dtype=bool)
+    for x1, y1, x2, y2 in boxes:
+        x1, y1 = max(0, int(x1)), max(0, int(y1))
+        x2, y2 = min(width, int(x2)), min(height, int(y2))
+        mask[y1:y2, x1:x2] = True
+
+    small = cv2.resize(image, (max(1, width // BLUR_DOWNSCALE), max(1, height // BLUR_DOWNSCALE)),
+                       interpolation=cv2.INTER_AREA)
+    blurred = cv2.resize(small, (width, height), interpolation=cv2.INTER_LINEAR)
+    np.copyto(image, blurred, where=mask[..., None] if image.ndim == 3 else mask)
+    return image
@@ -4,25 +4,35 @@ import json
 import signal
 import sys
 import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 from dotenv import load_dotenv
 from control_agent import ControlAgent, RobotState
 import time
-from datetime import datetime
 import argparse
 from process_image import ImageProcessor
-from supabase_upload import supabase, upload_stuff_images
+from supabase_upload import supabase
+from upload_queue import UploadQueue
+from dedup_index import DedupIndex
+from lib.frame_ring import SharedCamera
+from pipeline import DropOldestQueue, Stage, format_metrics
+from motion_gate import MotionGate
 
 load_dotenv()
 
 # MQTT setup
 MQTT_BROKER_ADDRESS = "localhost"
 MQTT_TOPIC = "robot/drive"
+MQTT_TOPIC_ODOMETRY = "robot/odometry"
 
 # Control parameters
 CONTROL_RATE = 2  # Hz - how often to get new commands
 MIN_TIME_BETWEEN_COMMANDS = 1.0 / CONTROL_RATE
 TIMEOUT_DURATION = 5.0  # seconds before stopping if no new commands received
 
+# Pipeline parameters
+UPLOAD_QUEUE_SIZE = 16  # detections waiting to be spooled before the oldest is dropped
+METRICS_INTERVAL = 10.0  # seconds between pipeline metrics printouts
+
 class RobotController:
     def __init__(self):
         self.last_command_time = time.time()
@@ -30,37 +40,47 @@ class RobotController:
         self.current_linear_velocity = 0.0
         self.current_angular_velocity = 0.0
         
-        # Create images directory
-        self.images_dir = 'images'
-        os.makedirs(self.images_dir, exist_ok=True)
-        
+        # Skips YOLO on frames that show nothing new (robot still, scene unchanged)
+        self.motion_gate = MotionGate()
+
         # MQTT setup
         self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+        self.client.on_connect = self.on_connect
+        self.client.on_message = self.on_message
         self.client.connect(MQTT_BROKER_ADDRESS)
         self.client.loop_start()
         
-        # Camera setup
-        self.cap = cv2.VideoCapture(0)
-        self.setup_camera()
+        # Camera setup (frames come from core/node_camera.py)
+        self.cap = SharedCamera()
         
         # Register signal handler
         signal.signal(signal.SIGINT, self.signal_handler)
         
         self.control_agent = ControlAgent()
         
+        # Objects already uploaded (same track or near-identical crop) aren't sent again
+        self.dedup_index = DedupIndex()
+        # Uploads survive network outages and restarts in an on-disk spool. A crop is
+        # indexed when spooled; if its upload is given up on, it is forgotten again.
+        self.upload_queue = UploadQueue(supabase, on_dead=self.dedup_index.remove)
+
         # Initialize image processor
         self.image_processor = ImageProcessor.get_instance(
             display_enabled=True,
             save_images=False,
-            conf_threshold=0.5
+            conf_threshold=0.5,
+            blur_people=True  # never upload recognisable people
         )
 
-    def setup_camera(self):
-        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-        self.cap.set(cv2.CAP_PROP_FPS, 30)
-        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-        self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc('M', 'J', 'P', 'G'))
+    def on_connect(self, client, userdata, flags, reason_code, properties=None):
+        client.subscribe(MQTT_TOPIC_ODOMETRY)
+
+    def on_message(self, client, userdata, msg):
+        try:
+            odom = json.loads(msg.payload)
+            self.motion_gate.update_odometry(odom['x'], odom['y'], odom['theta'])
+        except (ValueError, KeyError, TypeError):
+            pass
 
     def send_movement_command(self, linear_vel, angular_vel):
         data = {
@@ -96,99 +116,153 @@ class RobotController:
         print('\nGracefully shutting down...')
         self.running = False
 
+    # -------------------------------------------------------------------------
+    # Pipeline stages
+    # -------------------------------------------------------------------------
+    def capture_stage(self):
+        """Source: grab every new camera frame as it arrives; downstream queues drop what can't keep up."""
+        if self.cap.ring.wait_for_new(self.cap.last_seq, timeout=0.1) is None:
+            return None
+
+        ret, frame = self.cap.read()
+        if not ret:
+            print("Error reading from webcam")
+            self.running = False
+            return None
+        return frame
+
+    def gate_stage(self, frame):
+        """Pass the frame on only if it is novel enough to be worth detecting."""
+        return frame if self.motion_gate.check(frame) else None
+
+    def detect_stage(self, frame):
+        """Run YOLO and hand the results to the upload and control stages."""
+        full_images, cropped_images, detections = self.image_processor.process_image(frame)
+        return {
+            'frame': frame,
+            'full_images': full_images,
+            'cropped_images': cropped_images,
+            'shots': list(self.image_processor.last_shots),
+            'detections': detections,
+        }
+
+    def upload_stage(self, result):
+        """Spool images for upload (one best-shot pair per tracked object)."""
+        full_images, cropped_images = result['full_images'], result['cropped_images']
+        if not (full_images and cropped_images):
+            return None
+
+        # Encoded once and journaled on disk; UploadQueue's workers send them when the link allows
+        for full_image, cropped_image, (object_id, class_name) in zip(full_images, cropped_images, result['shots']):
+            value, duplicate_of = self.dedup_index.match(cropped_image, object_id, class_name)
+            if duplicate_of is not None:
+                continue
+            key = self.upload_queue.enqueue(full_image, cropped_image)
+            self.dedup_index.add(value, object_id, class_name, key)
+        return None
+
+    def control_stage(self, result):
+        """Turn the newest detection result into a movement command, at most CONTROL_RATE times a second."""
+        now = time.time()
+        if now < self.next_control_time:
+            return None
+        self.next_control_time = now + MIN_TIME_BETWEEN_COMMANDS
+
+        try:
+            # Always steer from the current frame; full_images are best shots from earlier frames
+            display_frame = result['frame']
+
+            # # Create robot state
+            # robot_state = RobotState(
+            #     current_linear_velocity=self.current_linear_velocity,
+            #     current_angular_velocity=self.current_angular_velocity
+            # )
+
+            # # Get movement commands from LLM. The agent downsizes and encodes the frame once.
+            # # Velocities are sent as soon as they stream in; past the agent's deadline the
+            # # request is cancelled and a stop command returned.
+            # movement = self.control_agent.get_movement_command(
+            #     display_frame, robot_state, is_path=False, on_velocity=self.send_movement_command
+            # )
+
+            # # Display the proposed movement
+            # print("\nExecuting Movement Command:")
+            # print(f"Mode: {self.control_agent.current_mode.name}")
+            # print(f"(lin, ang): ({movement.linear_velocity:.2f}, {movement.angular_velocity:.2f}) m/s")
+            # print(f"Description: {movement.description}")
+
+            # self.send_movement_command(
+            #     movement.linear_velocity,
+            #     movement.angular_velocity
+            # )
+
+        except Exception as e:
+            print(f"Error getting movement command: {e}")
+            self.stop_robot()
+        return None
+
     def run(self):
         print("StuffBot Real-time Control")
         print("Press Ctrl+C to quit")
 
-        last_process_time = 0
+        # capture -> gate -> detect -> (upload, control), each stage on its own thread.
+        # Capture runs at camera rate and detection as fast as YOLO allows, so
+        # tracking sees every frame it can; only control is held to CONTROL_RATE.
+        # Detection and control only care about the newest frame, so those queues
+        # hold one item and drop the oldest. The upload stage only encodes and
+        # spools to disk (UploadQueue deals with the network), so its queue just
+        # absorbs bursts of best shots.
+        self.next_control_time = 0.0
+        queues = {
+            'gate': DropOldestQueue(1),
+            'detect': DropOldestQueue(1),
+            'upload': DropOldestQueue(UPLOAD_QUEUE_SIZE),
+            'control': DropOldestQueue(1),
+        }
+        stages = [
+            Stage('capture', self.capture_stage, None, [queues['gate']]),
+            Stage('gate', self.gate_stage, queues['gate'], [queues['detect']]),
+            Stage('detect', self.detect_stage, queues['detect'], [queues['upload'], queues['control']]),
+            Stage('upload', self.upload_stage, queues['upload']),
+            Stage('control', self.control_stage, queues['control']),
+        ]
+        for stage in stages:
+            stage.start()
+        self.upload_queue.start()
 
+        last_metrics_time = time.time()
         try:
             while self.running:
+                time.sleep(0.1)
                 current_time = time.time()
-                
+
                 # Check for timeout
                 if current_time - self.last_command_time > TIMEOUT_DURATION:
                     print("Command timeout - stopping robot")
                     self.stop_robot()
-                
-                # Rate limiting
-                if current_time - last_process_time < MIN_TIME_BETWEEN_COMMANDS:
-                    time.sleep(0.01)  # Small sleep to prevent CPU spinning
-                    continue
-                
-                # Capture frame
-                self.cap.grab()  # Clear buffer
-                ret, frame = self.cap.read()
-                if not ret:
-                    print("Error reading from webcam")
-                    break
-                
-                try:
-                    # Process frame with image processor
-                    full_images, cropped_images, detections = self.image_processor.process_image(frame)
-                    
-                    # Save and upload images if available
-                    if full_images and cropped_images:
-                        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                        full_path = os.path.join(self.images_dir, f"full_{timestamp}.png")
-                        crop_path = os.path.join(self.images_dir, f"crop_{timestamp}.png")
-                        
-                        cv2.imwrite(full_path, full_images[0])
-                        cv2.imwrite(crop_path, cropped_images[0])
-                        
-                        success, error = upload_stuff_images(supabase, full_path, crop_path)
-                        if not success:
-                            print(f"Failed to upload images: {error}")
-                    
-                    # Print detections
-                    # if detections:
-                    #     print("\nDetected Objects:")
-                    #     for det in detections:
-                    #         print(f"- {det['class_name']} (ID: {det['object_id']}) at confidence {det['confidence']:.2f}")
-                    
-                    # Use the first full image for display and control if available, otherwise use original frame
-                    display_frame = full_images[0] if full_images else frame
-                    
-                    # Convert frame to JPEG format for the control agent
-                    _, buffer = cv2.imencode('.jpg', display_frame)
-                    image_bytes = buffer.tobytes()
-                    
-                    # # Create robot state
-                    # robot_state = RobotState(
-                    #     current_linear_velocity=self.current_linear_velocity,
-                    #     current_angular_velocity=self.current_angular_velocity
-                    # )
-                    
-                    # # Get movement commands from LLM
-                    # movement = self.control_agent.get_movement_command(image_bytes, robot_state, is_path=False)
-                    
-                    # # Display the proposed movement
-                    # print("\nExecuting Movement Command:")
-                    # print(f"Mode: {self.control_agent.current_mode.name}")
-                    # print(f"(lin, ang): ({movement.linear_velocity:.2f}, {movement.angular_velocity:.2f}) m/s")
-                    # print(f"Description: {movement.description}")
-                    
-                    # self.send_movement_command(
-                    #     movement.linear_velocity,
-                    #     movement.angular_velocity
-                    # )
-
-                    # time.sleep(1)
-
-                    # print("STOPPED BY SCRIPT")
-                    # self.stop_robot()
-                    
-                    last_process_time = time.time()
-                    
-                except Exception as e:
-                    print(f"Error getting movement command: {e}")
-                    self.stop_robot()
+
+                if current_time - last_metrics_time >= METRICS_INTERVAL:
+                    print("Pipeline metrics:")
+                    print(format_metrics(stages, queues))
+                    print(self.motion_gate.format_counts())
+                    print(self.dedup_index.format_counts())
+                    print(self.upload_queue.format_metrics())
+                    last_metrics_time = current_time
 
         except KeyboardInterrupt:
             print("\nProgram interrupted by user")
         except Exception as e:
             print(f"Error: {e}")
         finally:
+            for stage in stages:
+                stage.stop()
+            self.control_agent.cancel()
+            # Objects still in view haven't had their best shot uploaded yet
+            full_images, cropped_images = self.image_processor.flush()
+            self.upload_stage({'full_images': full_images, 'cropped_images': cropped_images,
+                               'shots': self.image_processor.last_shots})
+            self.upload_queue.close()
+            self.dedup_index.close()
             self.cleanup()
             print("Shutdown complete.")
 
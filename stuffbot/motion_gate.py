@@ -0,0 +1,99 @@
+import math
+import threading
+import time
+import cv2
+import numpy as np
+
+# Thumbnail used for frame differencing; small enough to be ~free on the Pi
+THUMB_SIZE = (64, 48)
+DIFF_THRESHOLD = 6.0        # mean absolute grey-level change (0-255) that counts as novel
+CHANGED_PIXEL_THRESHOLD = 25  # per-pixel change that counts that pixel as changed
+CHANGED_FRACTION = 0.02     # fraction of changed pixels that counts as novel (catches small objects)
+MOVE_THRESHOLD = 0.05       # metres driven since the last detection
+TURN_THRESHOLD = math.radians(5)  # radians turned since the last detection
+MAX_SKIP_TIME = 10.0        # always re-run detection at least this often
+
+class MotionGate:
+    def __init__(self, diff_threshold=DIFF_THRESHOLD, changed_fraction=CHANGED_FRACTION,
+                 move_threshold=MOVE_THRESHOLD, turn_threshold=TURN_THRESHOLD, max_skip_time=MAX_SKIP_TIME):
+        """
+        Decide whether a frame is different enough from the last detected one to
+        be worth running YOLO on. A frame is novel when the robot has moved or turned
+        (from robot/odometry), the downscaled image has changed, or max_skip_time
+        has passed since the last detection.
+        """
+        self.diff_threshold = diff_threshold
+        self.changed_fraction = changed_fraction
+        self.move_threshold = move_threshold
+        self.turn_threshold = turn_threshold
+        self.max_skip_time = max_skip_time
+
+        self.lock = threading.Lock()
+        self.pose = None            # latest odometry (x, y, theta)
+        self.reference_pose = None  # odometry at the last detected frame
+        self.reference_thumb = None
+        self.reference_time = 0.0
+
+        self.counts = {"checked": 0, "skipped": 0, "moved": 0, "changed": 0, "timeout": 0, "first": 0}
+
+    def update_odometry(self, x, y, theta):
+        """Feed the latest pose from robot/odometry (called from the MQTT thread)."""
+        with self.lock:
+            self.pose = (x, y, theta)
+
+    def thumbnail(self, frame):
+        grey = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        thumb = cv2.resize(grey, THUMB_SIZE, interpolation=cv2.INTER_AREA)
+        # Blur away sensor noise so it doesn't register as change
+        return cv2.GaussianBlur(thumb, (3, 3), 0)
+
+    def robot_moved(self):
+        if self.pose is None:
+            return False
+        if self.reference_pose is None:
+            # First odometry since the last detection, so we can't tell; assume movement
+            return True
+        x, y, theta = self.pose
+        ref_x, ref_y, ref_theta = self.reference_pose
+        turned = abs((theta - ref_theta + math.pi) % (2 * math.pi) - math.pi)
+        return math.hypot(x - ref_x, y - ref_y) > self.move_threshold or turned > self.turn_threshold
+
+    def scene_changed(self, thumb):
+        diff = cv2.absdiff(thumb, self.reference_thumb)
+        return (diff.mean() > self.diff_threshold or
+                np.count_nonzero(diff > CHANGED_PIXEL_THRESHOLD) > self.changed_fraction * diff.size)
+
+    def check(self, frame):
+        """
+        True if the frame should go through detection. Accepted frames become the
+        new reference, so slow drift is compared against the last detected frame.
+        """
+        thumb = self.thumbnail(frame)
+        now = time.monotonic()
+        with self.lock:
+            self.counts["checked"] += 1
+            if self.reference_thumb is None:
+                reason = "first"
+            elif self.robot_moved():
+                reason = "moved"
+            elif self.scene_changed(thumb):
+                reason = "changed"
+            elif now - self.reference_time > self.max_skip_time:
+                reason = "timeout"
+            else:
+                self.counts["skipped"] += 1
+                return False
+
+            self.counts[reason] += 1
+            self.reference_thumb = thumb
+            self.reference_pose = self.pose
+            self.reference_time = now
+            return True
+
+    def format_counts(self):
+        with self.lock:
+            counts = dict(self.counts)
+        checked = max(counts["checked"], 1)
+        return (f"  gate       checked={counts['checked']}  skipped={counts['skipped']} "
+                f"({counts['skipped'] / checked * 100:.0f}%)  passed: moved={counts['moved']} "
+                f"changed={counts['changed']} timeout={counts['timeout']}")
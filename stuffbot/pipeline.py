@@ -0,0 +1,103 @@
+import queue
+import threading
+import time
+
+class DropOldestQueue(queue.Queue):
+    def __init__(self, maxsize=1):
+        """Bounded queue whose put() never blocks: when full, the oldest item is discarded."""
+        super().__init__(maxsize)
+        self.dropped = 0
+
+    def put(self, item, block=False, timeout=None):
+        with self.mutex:
+            if 0 < self.maxsize <= self._qsize():
+                self._get()
+                self.dropped += 1
+            self._put(item)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+class StageMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.processed = 0
+        self.errors = 0
+        self.busy_time = 0.0
+        self.last_snapshot = (time.monotonic(), 0, 0.0)
+
+    def record(self, seconds, error=False):
+        with self.lock:
+            self.processed += 1
+            self.busy_time += seconds
+            if error:
+                self.errors += 1
+
+    def snapshot(self):
+        """(items/s, average ms per item, utilisation 0-1) since the previous snapshot."""
+        with self.lock:
+            now = time.monotonic()
+            last_time, last_processed, last_busy = self.last_snapshot
+            self.last_snapshot = (now, self.processed, self.busy_time)
+            elapsed = max(now - last_time, 1e-9)
+            count = self.processed - last_processed
+            busy = self.busy_time - last_busy
+        return count / elapsed, (busy / count * 1000.0) if count else 0.0, busy / elapsed
+
+class Stage:
+    def __init__(self, name, fn, in_queue, out_queues=()):
+        """
+        Worker thread that applies fn to every item from in_queue.
+        Non-None results are put on each of out_queues. With in_queue=None the
+        stage is a source and fn() is called in a loop (it should pace itself).
+        """
+        self.name = name
+        self.fn = fn
+        self.in_queue = in_queue
+        self.out_queues = list(out_queues)
+        self.metrics = StageMetrics()
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=2.0)
+
+    def _run(self):
+        while self.running:
+            args = ()
+            if self.in_queue is not None:
+                try:
+                    args = (self.in_queue.get(timeout=0.1),)
+                except queue.Empty:
+                    continue
+            start = time.monotonic()
+            result = None
+            error = False
+            try:
+                result = self.fn(*args)
+                if result is not None:
+                    for q in self.out_queues:
+                        q.put(result)
+            except Exception as e:
+                error = True
+                print(f"[{self.name}] Error: {e}")
+            # Idle source ticks (nothing produced) don't count as work
+            if args or result is not None or error:
+                self.metrics.record(time.monotonic() - start, error)
+
+def format_metrics(stages, queues):
+    """One line per stage plus queue depths and drop counts, for periodic printing."""
+    lines = []
+    for stage in stages:
+        rate, avg_ms, utilisation = stage.metrics.snapshot()
+        lines.append(f"  {stage.name:<10} {rate:6.2f}/s  {avg_ms:7.1f} ms/item  {utilisation * 100:5.1f}% busy"
+                     f"  errors={stage.metrics.errors}")
+    for name, q in queues.items():
+        lines.append(f"  queue {name:<10} depth={q.qsize()}/{q.maxsize}  dropped={getattr(q, 'dropped', 0)}")
+    return "\n".join(lines)
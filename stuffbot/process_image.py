@@ -1,8 +1,47 @@
 import cv2
+import numpy as np
 from ultralytics import YOLO
-import uuid
 import os
+import time
+import shutil
 import datetime
+from tracker import ByteTracker, LOW_CONF_THRESHOLD
+from best_shot import BestShotSelector
+from detection_filters import DEFAULT_DENY_CLASSES, PRIVACY_CLASS, resolve_class_ids, class_id
+
+# Inference engines. "pytorch" runs the .pt weights directly; the others export
+# them once (cached next to the weights) and run the exported model on CPU.
+ENGINES = ("pytorch", "onnx", "openvino")
+
+def export_model(model_path="yolov8n.pt", engine="openvino", imgsz=640, half=False, int8=False, batch=1):
+    """
+    Export YOLO weights for CPU inference and return the path of the exported model.
+    Exports are cached per engine/size/precision, so only the first call is slow.
+    :param engine: "onnx" or "openvino"
+    :param imgsz: Input size in pixels; smaller is faster (e.g. 320 or 416)
+    :param half: FP16 weights (OpenVINO only on CPU)
+    :param int8: INT8 post-training quantization (OpenVINO only, calibrates on coco8)
+    :param batch: Largest batch the exported model must accept
+    """
+    if engine not in ("onnx", "openvino"):
+        raise ValueError(f"Cannot export to engine '{engine}'")
+    if engine == "onnx" and (half or int8):
+        raise ValueError("ONNX export on CPU only supports FP32; use engine='openvino' for FP16/INT8")
+
+    precision = "int8" if int8 else "fp16" if half else "fp32"
+    stem = os.path.splitext(model_path)[0]
+    suffix = ".onnx" if engine == "onnx" else "_openvino_model"
+    cached_path = f"{stem}_{imgsz}_{precision}{suffix}"
+    if os.path.exists(cached_path):
+        return cached_path
+
+    print(f"Exporting {model_path} to {engine} ({precision}, {imgsz}px), this can take a few minutes...")
+    exported_path = YOLO(model_path).export(
+        format=engine, imgsz=imgsz, half=half, int8=int8,
+        dynamic=batch > 1, batch=batch,
+    )
+    shutil.move(exported_path, cached_path)
+    return cached_path
 
 class ImageProcessor:
     _instance = None
@@ -14,6 +53,7 @@ class ImageProcessor:
         else:
             # Update existing instance parameters
             cls._instance.conf_threshold = kwargs.get('conf_threshold', 0.5)
+            cls._instance.tracker.high_thresh = cls._instance.conf_threshold
             cls._instance.save_images = kwargs.get('save_images', True)
             if cls._instance.save_images:
                 # Create new output directory for this detection run
@@ -22,12 +62,44 @@ class ImageProcessor:
                 os.makedirs(cls._instance.output_dir, exist_ok=True)
         return cls._instance
 
-    def __init__(self, model_path="yolov8n.pt", display_enabled=False, conf_threshold=0.5, save_images=True):
-        """Initialize ImageProcessor with YOLO model"""
-        self.model = YOLO(model_path)
-        self.display_enabled = display_enabled
-        self.tracked_objects = {}
+    def __init__(self, model_path="yolov8n.pt", display_enabled=False, conf_threshold=0.5, save_images=True,
+                 engine="pytorch", imgsz=640, half=False, int8=False, max_batch=1, num_threads=None, warmup=2,
+                 allow_classes=None, deny_classes=DEFAULT_DENY_CLASSES, blur_people=False):
+        """
+        Initialize ImageProcessor with YOLO model
+        :param engine: "pytorch", "onnx" or "openvino" (see export_model)
+        :param imgsz: Inference input size in pixels
+        :param half: FP16 inference (OpenVINO)
+        :param int8: INT8 quantized inference (OpenVINO)
+        :param max_batch: Largest number of frames passed to process_batch() at once
+        :param num_threads: CPU threads for inference, or None for the library default
+        :param warmup: Dummy inferences run at startup so the first real frame isn't slow
+        :param allow_classes: Class names to detect, or None for all
+        :param deny_classes: Class names never detected (people by default)
+        :param blur_people: Still detect people, but only to blur them out of saved images
+        """
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown inference engine '{engine}', expected one of {ENGINES}")
+        self.engine = engine
         self.conf_threshold = conf_threshold
+        self.imgsz = imgsz
+        self.max_batch = max_batch
+        self.set_num_threads(num_threads)
+
+        if engine == "pytorch":
+            self.model = YOLO(model_path)
+        else:
+            self.model = YOLO(export_model(model_path, engine, imgsz, half, int8, max_batch), task="detect")
+        self.set_class_filter(allow_classes, deny_classes, blur_people)
+        self.warmup(warmup)
+
+        self.display_enabled = display_enabled
+        self.tracker = ByteTracker(high_thresh=conf_threshold)
+        self.best_shots = BestShotSelector()
+        self.last_frame = None
+        self.last_detections = []
+        self.last_shots = []  # (object_id, class_name) for each image pair last returned
+        self.display_buffer = None
         self.save_images = save_images
         
         # Create output directory only if saving images
@@ -36,9 +108,57 @@ class ImageProcessor:
             self.output_dir = os.path.join("detected_objects", f"detection_run_{timestamp}")
             os.makedirs(self.output_dir, exist_ok=True)
 
-    def generate_unique_id(self):
-        """Generate a unique identifier for each detected object"""
-        return str(uuid.uuid4())[:8]
+    def set_num_threads(self, num_threads):
+        """Limit the CPU threads used by inference (torch, OpenCV and OpenMP-based runtimes)."""
+        self.num_threads = num_threads
+        if num_threads is None:
+            return
+        # Read by OpenMP when the exported model's runtime is loaded, so set it before YOLO()
+        os.environ["OMP_NUM_THREADS"] = str(num_threads)
+        cv2.setNumThreads(num_threads)
+        import torch
+        torch.set_num_threads(num_threads)
+
+    def set_class_filter(self, allow_classes=None, deny_classes=DEFAULT_DENY_CLASSES, blur_people=False):
+        """Restrict which classes inference returns; filtering happens inside the model's NMS."""
+        names = self.model.names
+        self.track_class_ids = resolve_class_ids(names, allow_classes, deny_classes)
+        self.privacy_class_id = class_id(names, PRIVACY_CLASS) if blur_people else None
+        self.inference_classes = self.track_class_ids
+        if self.inference_classes is not None and self.privacy_class_id is not None:
+            self.inference_classes = sorted(set(self.inference_classes) | {self.privacy_class_id})
+
+    def warmup(self, iterations=2):
+        """Run dummy inferences at the largest batch size to trigger lazy initialization."""
+        if iterations <= 0:
+            return
+        dummy = [np.zeros((480, 640, 3), dtype=np.uint8)] * self.max_batch
+        for _ in range(iterations):
+            self.infer(dummy)
+
+    def infer(self, frames):
+        """Run the model on a list of frames as one batch and return one result per frame."""
+        # Keep detections below conf_threshold; the tracker uses them to hold on to known objects
+        conf = min(self.conf_threshold, LOW_CONF_THRESHOLD)
+        return self.model(frames, conf=conf, imgsz=self.imgsz, classes=self.inference_classes, verbose=False)
+
+    def benchmark(self, frame, batch_sizes=(1, 2, 4), iterations=10):
+        """
+        Measure inference throughput for each batch size on the current engine.
+        Returns {batch_size: frames per second}.
+        """
+        fps = {}
+        for batch_size in batch_sizes:
+            frames = [frame] * batch_size
+            self.infer(frames)
+            start = time.perf_counter()
+            for _ in range(iterations):
+                self.infer(frames)
+            elapsed = time.perf_counter() - start
+            fps[batch_size] = batch_size * iterations / elapsed
+            print(f"[{self.engine} {self.imgsz}px threads={self.num_threads}] "
+                  f"batch {batch_size}: {fps[batch_size]:.1f} fps ({elapsed / iterations * 1000:.0f} ms/batch)")
+        return fps
 
     def save_detection_images(self, frame, box, class_name, object_id):
         """Save both the full frame with single box and cropped object"""
@@ -77,72 +197,98 @@ class ImageProcessor:
             return None, None, []
 
         # Run YOLOv8 inference with confidence threshold
-        results = self.model(frame, conf=self.conf_threshold)
-        
-        # Create a separate frame for display
-        display_frame = frame.copy() if self.display_enabled else None
-        
+        results = self.infer([frame])
+        return self.handle_result(frame, results[0])
+
+    def process_batch(self, frames):
+        """
+        Process several frames with one inference call (up to max_batch at a time).
+        Returns a list with one (full_images, cropped_images, detections) tuple per frame.
+        """
+        frames = [frame for frame in frames if frame is not None]
+        outputs = []
+        for i in range(0, len(frames), self.max_batch):
+            chunk = frames[i:i + self.max_batch]
+            for frame, result in zip(chunk, self.infer(chunk)):
+                outputs.append(self.handle_result(frame, result))
+        return outputs
+
+    def handle_result(self, frame, result):
+        """Turn the YOLO result for one frame into full/cropped images and detections"""
         detections = []
         full_images = []
         cropped_images = []
         
-        # Process each detection
-        for result in results[0].boxes.data:
-            x1, y1, x2, y2, conf, class_id = result
-            class_name = self.model.names[int(class_id)]
-            
-            # Skip if the detected object is a person
-            if class_name.lower() == 'person':
-                continue
-            
-            # Generate or retrieve object ID
-            detection_key = f"{class_name}_{int(x1)}_{int(y1)}"
-            if detection_key not in self.tracked_objects:
-                self.tracked_objects[detection_key] = self.generate_unique_id()
-            object_id = self.tracked_objects[detection_key]
-            
-            # Skip if there's already a detection with this object_id
-            if any(d['object_id'] == object_id for d in detections):
-                continue
-                
-            # Create separate frames for this detection
-            frame_with_single_box = frame.copy()
-            height, width = frame.shape[:2]
-            
-            # Add padding to the box (20 pixels on each side)
-            padding = 20
-            x1_padded = max(0, int(x1) - padding)
-            y1_padded = max(0, int(y1) - padding)
-            x2_padded = min(width, int(x2) + padding)
-            y2_padded = min(height, int(y2) + padding)
-            
-            # Draw box on single-detection frame
-            cv2.rectangle(frame_with_single_box, (x1_padded, y1_padded), (x2_padded, y2_padded), (0, 255, 0), 2)
-            cv2.putText(frame_with_single_box, class_name,
-                        (x1_padded, y1_padded - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-            
-            # Create cropped image
-            cropped_image = frame[y1_padded:y2_padded, x1_padded:x2_padded]
-            
-            # Add images to their respective lists
-            full_images.append(frame_with_single_box)
-            cropped_images.append(cropped_image)
-            
+        # Collect detections for the tracker (low-confidence ones too, see tracker.py)
+        frame_detections = []
+        privacy_boxes = []
+        for x1, y1, x2, y2, conf, cls in result.boxes.data.cpu().numpy().tolist():
+            cls = int(cls)
+            # People are only detected so they can be blurred out of saved images
+            if cls == self.privacy_class_id:
+                privacy_boxes.append((x1, y1, x2, y2))
+                if self.track_class_ids is not None and cls not in self.track_class_ids:
+                    continue
+            frame_detections.append(([x1, y1, x2, y2], conf, cls, self.model.names[cls]))
+
+        # Process each tracked object seen in this frame
+        for track in self.tracker.update(frame_detections):
+            x1, y1, x2, y2 = track.box
+            class_name = track.class_name
+            object_id = track.track_id
+
             detections.append({
                 'class_name': class_name,
                 'object_id': object_id,
-                'confidence': conf,
+                'confidence': track.confidence,
                 'box': [x1, y1, x2, y2]
             })
-            
-            # Display if enabled
-            if self.display_enabled:
-                cv2.rectangle(display_frame, (int(x1), int(y1)), (int(x2), int(y2)), (0, 255, 0), 2)
-                cv2.putText(display_frame, f"{class_name} {object_id}", (int(x1), int(y1) - 10),
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+
+
+            # Remember the best view of this object so far
+            self.best_shots.offer(track, frame, privacy_boxes)
+
+        # One full/crop pair per object, from its best frame, once it matures or leaves view
+        self.last_shots = []
+        for shot in self.best_shots.collect(self.tracker.tracks, self.tracker.removed):
+            full_image, cropped_image = shot.render()
+            full_images.append(full_image)
+            cropped_images.append(cropped_image)
+            self.last_shots.append((shot.object_id, shot.class_name))
+
+        # Kept for annotated_frame(); nothing is drawn unless someone asks for it
+        self.last_frame = frame
+        self.last_detections = detections
 
         return full_images if full_images else None, cropped_images if cropped_images else None, detections
 
+    def annotated_frame(self, out=None):
+        """
+        Render the last processed frame with all tracked boxes and IDs.
+        Draws into out, or into a buffer reused across calls, so the result is
+        only valid until the next call.
+        """
+        if self.last_frame is None:
+            return None
+        if out is None:
+            if self.display_buffer is None or self.display_buffer.shape != self.last_frame.shape:
+                self.display_buffer = np.empty_like(self.last_frame)
+            out = self.display_buffer
+        np.copyto(out, self.last_frame)
+        for det in self.last_detections:
+            x1, y1, x2, y2 = map(int, det['box'])
+            cv2.rectangle(out, (x1, y1), (x2, y2), (0, 255, 0), 2)
+            cv2.putText(out, f"{det['class_name']} {det['object_id']}", (x1, y1 - 10),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+        return out
+
+    def flush(self):
+        """End all tracks (e.g. on shutdown) and return the full/cropped images of their best shots"""
+        shots = self.best_shots.collect([], self.tracker.flush())
+        self.last_shots = [(shot.object_id, shot.class_name) for shot in shots]
+        rendered = [shot.render() for shot in shots]
+        return [full for full, _ in rendered] or None, [crop for _, crop in rendered] or None
+
     def toggle_display(self):
         """Toggle the display on/off"""
         self.display_enabled = not self.display_enabled
@@ -154,6 +300,8 @@ def process_single_image(image_path, conf_threshold=0.5, save_images=True):
         save_images=save_images,
         display_enabled=True
     )
+    # A single image is only seen once, so report every detection without waiting for confirmation
+    processor.tracker.min_hits = 1
     
     try:
         # Read the image
@@ -162,7 +310,8 @@ def process_single_image(image_path, conf_threshold=0.5, save_images=True):
             raise ValueError(f"Could not read image at {image_path}")
             
         # Process the image
-        display_frame, cropped_image, detections = processor.process_image(frame)
+        _, _, detections = processor.process_image(frame)
+        display_frame = processor.annotated_frame()
         
         # Display the frame with detections
         cv2.imshow('Object Detection', display_frame)
@@ -175,8 +324,26 @@ def process_single_image(image_path, conf_threshold=0.5, save_images=True):
         return []
 
 if __name__ == "__main__":
-    # Test the script with a sample image
-    test_image_path = "path/to/test/image.jpg"  # Replace with actual test image path
-    detections = process_single_image(test_image_path)
-    for detection in detections:
-        print(f"Detected {detection['class_name']} with ID {detection['object_id']}") 
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="Run YOLO on an image, or benchmark an inference engine")
+    parser.add_argument("image", nargs="?", default="path/to/test/image.jpg", help="Test image")
+    parser.add_argument("--benchmark", action="store_true", help="Measure throughput instead of displaying")
+    parser.add_argument("--engine", choices=ENGINES, default="pytorch")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--half", action="store_true", help="FP16 (OpenVINO)")
+    parser.add_argument("--int8", action="store_true", help="INT8 (OpenVINO)")
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 2, 4], help="Batch sizes to benchmark")
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.benchmark:
+        processor = ImageProcessor(engine=args.engine, imgsz=args.imgsz, half=args.half, int8=args.int8,
+                                   max_batch=max(args.batch), num_threads=args.threads, save_images=False)
+        frame = cv2.imread(args.image)
+        if frame is None:
+            frame = np.random.randint(0, 255, (480, 640, 3), dtype=np.uint8)
+        processor.benchmark(frame, batch_sizes=args.batch)
+    else:
+        detections = process_single_image(args.image)
+        for detection in detections:
+            print(f"Detected {detection['class_name']} with ID {detection['object_id']}") 
\ No newline at end of file
@@ -1,8 +1,13 @@
 import os
-import uuid
-from typing import Tuple
+import sys
+import threading
+from typing import Tuple, Union
+import cv2
+import numpy as np
 from supabase import create_client
 from dotenv import load_dotenv
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from lib.supabase_batch import BatchUploader
 
 load_dotenv()
 
@@ -12,50 +17,105 @@ supabase = create_client(
     os.getenv('SUPABASE_KEY')
 )
 
+BUCKET = 'stuff_images_bucket'
+
+# Upload encoding; JPEG at 85 is ~5-10x smaller than PNG for camera frames
+IMAGE_FORMAT = "jpeg"
+IMAGE_QUALITY = 85
+
+# format -> (extension, content type, OpenCV quality flag)
+ENCODINGS = {
+    "jpeg": (".jpg", "image/jpeg", cv2.IMWRITE_JPEG_QUALITY),
+    "webp": (".webp", "image/webp", cv2.IMWRITE_WEBP_QUALITY),
+    "png": (".png", "image/png", None),
+}
+
+ImageData = Union[np.ndarray, bytes]
+
+def sniff_format(data: bytes) -> str:
+    """Format of already-encoded image bytes, from their magic number."""
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "png"
+    if data[:3] == b"\xff\xd8\xff":
+        return "jpeg"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    raise ValueError("Unrecognised image encoding (expected PNG, JPEG or WebP)")
+
+def encode_image(image: ImageData, image_format: str = IMAGE_FORMAT,
+                 quality: int = IMAGE_QUALITY) -> Tuple[bytes, str, str]:
+    """
+    Encode an image once for upload.
+    :param image: BGR array, or bytes that are already encoded (passed through untouched)
+    :return: (data, file extension, content type)
+    """
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        data = bytes(image)
+        extension, content_type, _ = ENCODINGS[sniff_format(data)]
+        return data, extension, content_type
+
+    extension, content_type, quality_flag = ENCODINGS[image_format]
+    params = [quality_flag, int(quality)] if quality_flag is not None else []
+    ok, buffer = cv2.imencode(extension, image, params)
+    if not ok:
+        raise ValueError(f"Could not encode image as {image_format}")
+    return buffer.tobytes(), extension, content_type
+
+_uploaders = {}   # id(client) -> (client, uploader); the client is kept so its id isn't reused
+_uploaders_lock = threading.Lock()
+
+def get_uploader(supabase_client) -> BatchUploader:
+    """Shared BatchUploader (thread pool + pooled connections) for a client."""
+    with _uploaders_lock:
+        if id(supabase_client) not in _uploaders:
+            _uploaders[id(supabase_client)] = (supabase_client, BatchUploader(supabase_client, bucket=BUCKET))
+        return _uploaders[id(supabase_client)][1]
+
+def upload_encoded_pair(supabase_client, full_image, partial_image, key=None):
+    """
+    Upload an encoded (data, extension, content type) full/partial pair and insert its row.
+    Both objects go up concurrently. Raises on failure. With an idempotency key,
+    object names are derived from it and uploads overwrite, so retrying a
+    half-finished upload never creates duplicates.
+    """
+    error = get_uploader(supabase_client).upload_pairs([(key, full_image, partial_image)])[0]
+    if error is not None:
+        raise RuntimeError(error)
+
+def upload_stuff_image_data(
+    supabase_client,
+    full_image: ImageData,
+    partial_image: ImageData,
+    image_format: str = IMAGE_FORMAT,
+    quality: int = IMAGE_QUALITY,
+) -> Tuple[bool, str]:
+    """Encode (if needed) and upload a full/partial image pair straight from memory, then insert its row."""
+    try:
+        upload_encoded_pair(
+            supabase_client,
+            encode_image(full_image, image_format, quality),
+            encode_image(partial_image, image_format, quality),
+        )
+        return True, ""
+        
+    except Exception as e:
+        return False, str(e)
+
 def upload_stuff_images(
     supabase_client,
     full_image_path: str,
     partial_image_path: str,
 ) -> Tuple[bool, str]:
-    try:
-        # Check if files exist
-        if not os.path.exists(full_image_path) or not os.path.exists(partial_image_path):
-            return False, f"Image files not found: {full_image_path} and/or {partial_image_path}"
+    """Upload an image pair from files; they are sent as they are, without re-encoding."""
+    # Check if files exist
+    if not os.path.exists(full_image_path) or not os.path.exists(partial_image_path):
+        return False, f"Image files not found: {full_image_path} and/or {partial_image_path}"
 
-        # Generate unique IDs for the images
-        full_image_id = f"{uuid.uuid4()}.png"
-        partial_image_id = f"{uuid.uuid4()}.png"
-        
-        # Upload full image
+    try:
         with open(full_image_path, 'rb') as f:
-            supabase_client.storage.from_('stuff_images_bucket').upload(
-                full_image_id,
-                f.read(),
-                file_options={"content-type": "image/png"}
-            )
-        print("Full image uploaded")
-        
-        # Upload partial image
+            full_image = f.read()
         with open(partial_image_path, 'rb') as f:
-            supabase_client.storage.from_('stuff_images_bucket').upload(
-                partial_image_id,
-                f.read(),
-                file_options={"content-type": "image/png"}
-            )
-        print("Partial image uploaded")
-
-        # Insert record into stuff table
-        data = {
-            "full_image_id": full_image_id,
-            "partial_image_id": partial_image_id,
-            "class": "unknown",
-            "approximate_price": 0.00,
-            "location_description": "unknown"
-        }
-        print(data)
-        result = supabase_client.table('stuff').insert(data).execute()
-        print(f"Insert result: {result}")
-        return True, ""
-        
-    except Exception as e:
-        return False, str(e) 
\ No newline at end of file
+            partial_image = f.read()
+    except OSError as e:
+        return False, str(e)
+    return upload_stuff_image_data(supabase_client, full_image, partial_image)
@@ -0,0 +1,187 @@
+import uuid
+import numpy as np
+
+# -----------------------------------------------------------------------------
+# ByteTrack-style multi-object tracker
+# -----------------------------------------------------------------------------
+# Detections are associated with existing tracks by IoU against each track's
+# Kalman-predicted box, in two passes: confident detections first, then
+# low-confidence ones (often the same object partly occluded or blurred) against
+# the tracks still unmatched. Tracks must be seen MIN_HITS times before they
+# are confirmed and are evicted after MAX_AGE frames without a match.
+HIGH_CONF_THRESHOLD = 0.5
+LOW_CONF_THRESHOLD = 0.1
+MATCH_IOU = 0.3        # minimum IoU for the first association pass
+LOW_MATCH_IOU = 0.5    # stricter IoU for low-confidence detections
+MIN_HITS = 2
+MAX_AGE = 30           # processed frames a confirmed track survives unmatched
+
+TENTATIVE, CONFIRMED, LOST = "tentative", "confirmed", "lost"
+
+def box_to_state(box):
+    x1, y1, x2, y2 = box
+    return np.array([(x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1], dtype=float)
+
+def state_to_box(state):
+    cx, cy, w, h = state[:4]
+    return np.array([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2])
+
+def iou_matrix(boxes_a, boxes_b):
+    """Pairwise IoU between two (N, 4) and (M, 4) arrays of x1, y1, x2, y2 boxes."""
+    if len(boxes_a) == 0 or len(boxes_b) == 0:
+        return np.zeros((len(boxes_a), len(boxes_b)))
+    a = np.asarray(boxes_a, dtype=float)[:, None, :]
+    b = np.asarray(boxes_b, dtype=float)[None, :, :]
+    inter_w = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    inter_h = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = inter_w * inter_h
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    return inter / np.maximum(area_a + area_b - inter, 1e-9)
+
+def greedy_match(iou, threshold):
+    """
+    Pair rows and columns by descending IoU. Returns (matches, unmatched_rows, unmatched_cols).
+    Greedy is what ByteTrack's Hungarian step reduces to for the handful of objects we see.
+    """
+    matches = []
+    if iou.size:
+        iou = iou.copy()
+        while True:
+            row, col = np.unravel_index(np.argmax(iou), iou.shape)
+            if iou[row, col] < threshold:
+                break
+            matches.append((row, col))
+            iou[row, :] = -1
+            iou[:, col] = -1
+    matched_rows = {r for r, _ in matches}
+    matched_cols = {c for _, c in matches}
+    return (matches,
+            [r for r in range(iou.shape[0]) if r not in matched_rows],
+            [c for c in range(iou.shape[1]) if c not in matched_cols])
+
+class KalmanBox:
+    def __init__(self, box):
+        """Constant-velocity Kalman filter over box centre and size (cx, cy, w, h)."""
+        self.x = np.zeros(8)
+        self.x[:4] = box_to_state(box)
+        size = max(self.x[2], self.x[3])
+        self.P = np.diag([size, size, size, size, 10 * size, 10 * size, 10 * size, 10 * size]) ** 2 / 400
+        self.F = np.eye(8)
+        self.F[:4, 4:] = np.eye(4)
+        self.H = np.eye(4, 8)
+
+    def predict(self):
+        size = max(self.x[2], self.x[3], 1.0)
+        Q = np.diag([size / 20] * 4 + [size / 160] * 4) ** 2
+        self.x = self.F @ self.x
+        self.P = self.F @ self.P @ self.F.T + Q
+        return state_to_box(self.x)
+
+    def update(self, box):
+        size = max(self.x[2], self.x[3], 1.0)
+        R = np.diag([size / 20] * 4) ** 2
+        y = box_to_state(box) - self.H @ self.x
+        S = self.H @ self.P @ self.H.T + R
+        K = self.P @ self.H.T @ np.linalg.inv(S)
+        self.x = self.x + K @ y
+        self.P = (np.eye(8) - K @ self.H) @ self.P
+
+class Track:
+    def __init__(self, box, confidence, class_id, class_name):
+        self.track_id = str(uuid.uuid4())[:8]
+        self.class_id = class_id
+        self.class_name = class_name
+        self.kalman = KalmanBox(box)
+        self.box = np.asarray(box, dtype=float)   # last matched detection
+        self.predicted_box = self.box
+        self.confidence = confidence
+        self.state = TENTATIVE
+        self.hits = 1
+        self.age = 1
+        self.time_since_update = 0
+
+    def predict(self):
+        self.predicted_box = self.kalman.predict()
+        self.age += 1
+        self.time_since_update += 1
+
+    def update(self, box, confidence, min_hits):
+        self.kalman.update(box)
+        self.box = np.asarray(box, dtype=float)
+        self.confidence = confidence
+        self.hits += 1
+        self.time_since_update = 0
+        if self.state == LOST or (self.state == TENTATIVE and self.hits >= min_hits):
+            self.state = CONFIRMED
+
+class ByteTracker:
+    def __init__(self, high_thresh=HIGH_CONF_THRESHOLD, low_thresh=LOW_CONF_THRESHOLD,
+                 match_iou=MATCH_IOU, min_hits=MIN_HITS, max_age=MAX_AGE):
+        self.high_thresh = high_thresh
+        self.low_thresh = low_thresh
+        self.match_iou = match_iou
+        self.min_hits = min_hits
+        self.max_age = max_age
+        self.tracks = []
+        self.removed = []   # tracks evicted by the most recent update()
+
+    def associate(self, tracks, detections, threshold):
+        """Match tracks to (box, confidence, class_id, class_name) detections of the same class."""
+        iou = iou_matrix([t.predicted_box for t in tracks], [d[0] for d in detections])
+        for i, track in enumerate(tracks):
+            for j, detection in enumerate(detections):
+                if track.class_id != detection[2]:
+                    iou[i, j] = 0.0
+        return greedy_match(iou, threshold)
+
+    def update(self, detections):
+        """
+        Advance all tracks by one frame.
+        :param detections: list of (box, confidence, class_id, class_name) with box as x1, y1, x2, y2
+        :return: Confirmed tracks that were matched in this frame
+        """
+        for track in self.tracks:
+            track.predict()
+
+        high = [d for d in detections if d[1] >= self.high_thresh]
+        low = [d for d in detections if self.low_thresh <= d[1] < self.high_thresh]
+
+        # First pass: confident detections against every track
+        matches, unmatched_tracks, unmatched_high = self.associate(self.tracks, high, self.match_iou)
+        for t, d in matches:
+            self.tracks[t].update(high[d][0], high[d][1], self.min_hits)
+
+        # Second pass: low-confidence detections keep established tracks alive
+        remaining = [self.tracks[t] for t in unmatched_tracks if self.tracks[t].state != TENTATIVE]
+        matches, unmatched_remaining, _ = self.associate(remaining, low, LOW_MATCH_IOU)
+        for t, d in matches:
+            remaining[t].update(low[d][0], low[d][1], self.min_hits)
+        still_unmatched = {id(remaining[t]) for t in unmatched_remaining}
+        still_unmatched.update(id(self.tracks[t]) for t in unmatched_tracks if self.tracks[t].state == TENTATIVE)
+
+        # Lifecycle: unconfirmed tracks die on their first miss, confirmed ones go lost then expire
+        self.removed = []
+        kept = []
+        for track in self.tracks:
+            if id(track) in still_unmatched:
+                if track.state == TENTATIVE or track.time_since_update > self.max_age:
+                    self.removed.append(track)
+                    continue
+                track.state = LOST
+            kept.append(track)
+
+        # Unmatched confident detections start new tracks (confirmed at once with min_hits=1)
+        for d in unmatched_high:
+            track = Track(*high[d])
+            if self.min_hits <= 1:
+                track.state = CONFIRMED
+            kept.append(track)
+        self.tracks = kept
+
+        return [t for t in self.tracks if t.state == CONFIRMED and t.time_since_update == 0]
+
+    def flush(self):
+        """End every track (e.g. on shutdown). Returns the tracks that were alive."""
+        self.removed, self.tracks = self.tracks, []
+        return self.removed
@@ -0,0 +1,229 @@
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from supabase_upload import encode_image, get_uploader, IMAGE_FORMAT, IMAGE_QUALITY
+
+# -----------------------------------------------------------------------------
+# Durable upload queue
+# -----------------------------------------------------------------------------
+# Every image pair is encoded once and written to a SQLite journal before this
+# returns, so detections survive network outages and restarts. Worker threads
+# drain the journal in order, retrying failures with capped exponential backoff.
+# Each job has an idempotency key that names its storage objects, so a retry
+# after a partial upload overwrites rather than duplicates. Failures during an
+# outage only delay a job; a job that fails MAX_ATTEMPTS times while the link is
+# up is marked dead and kept in the spool for inspection.
+SPOOL_PATH = os.path.expanduser("~/stuffbot_spool/uploads.db")
+NUM_WORKERS = 2
+BACKOFF_BASE = 2.0     # seconds before the first retry
+BACKOFF_MAX = 300.0    # cap on the retry delay
+POLL_INTERVAL = 1.0    # idle workers check for due jobs this often
+CLAIM_BATCH = 20       # jobs a worker takes at once (uploaded concurrently, rows inserted together)
+MAX_ATTEMPTS = 10      # job-specific (non-outage) failures before a job is dead-lettered
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS uploads (
+    key TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    full_data BLOB NOT NULL,
+    full_ext TEXT NOT NULL,
+    full_type TEXT NOT NULL,
+    partial_data BLOB NOT NULL,
+    partial_ext TEXT NOT NULL,
+    partial_type TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,   -- failures that weren't outages; counts toward MAX_ATTEMPTS
+    retries INTEGER NOT NULL DEFAULT 0,    -- consecutive failures of any kind; sets the backoff
+    next_attempt_at REAL NOT NULL,
+    in_flight INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    transient INTEGER NOT NULL DEFAULT 0,
+    dead INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+class UploadQueue:
+    def __init__(self, supabase_client, path=SPOOL_PATH, num_workers=NUM_WORKERS,
+                 image_format=IMAGE_FORMAT, quality=IMAGE_QUALITY, on_dead=None):
+        """
+        :param on_dead: Called with a job's key when it is dead-lettered (it will never be uploaded)
+        """
+        self.client = supabase_client
+        self.on_dead = on_dead
+        self.num_workers = num_workers
+        self.image_format = image_format
+        self.quality = quality
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(SCHEMA)
+        # Jobs claimed by a previous run that died mid-upload are pending again
+        self.db.execute("UPDATE uploads SET in_flight = 0")
+        self.db.commit()
+        self.db_lock = threading.Lock()
+        self.wakeup = threading.Event()
+
+        self.running = False
+        self.workers = []
+        self.link_down = False   # last evidence about the link was a whole batch failing
+        self.metrics_lock = threading.Lock()
+        self.counts = {"enqueued": 0, "uploaded": 0, "failures": 0, "dead": 0, "bytes_uploaded": 0}
+
+    # -------------------------------------------------------------------------
+    # Producer side
+    # -------------------------------------------------------------------------
+    def enqueue(self, full_image, partial_image):
+        """Encode and persist an image pair for upload. Returns its idempotency key."""
+        full = encode_image(full_image, self.image_format, self.quality)
+        partial = encode_image(partial_image, self.image_format, self.quality)
+        key = str(uuid.uuid4())
+        now = time.time()
+        with self.db_lock:
+            self.db.execute(
+                "INSERT INTO uploads (key, created_at, full_data, full_ext, full_type, "
+                "partial_data, partial_ext, partial_type, next_attempt_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, now, full[0], full[1], full[2], partial[0], partial[1], partial[2], now))
+            self.db.commit()
+        with self.metrics_lock:
+            self.counts["enqueued"] += 1
+        self.wakeup.set()
+        return key
+
+    # -------------------------------------------------------------------------
+    # Workers
+    # -------------------------------------------------------------------------
+    def start(self):
+        self.running = True
+        for i in range(self.num_workers):
+            worker = threading.Thread(target=self._worker, name=f"upload-{i}", daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def stop(self, timeout=5.0):
+        """Stop the workers; anything not yet uploaded stays in the spool for next time."""
+        self.running = False
+        self.wakeup.set()
+        for worker in self.workers:
+            worker.join(timeout=timeout)
+        self.workers = []
+
+    def claim(self, limit=CLAIM_BATCH):
+        """Mark up to limit of the oldest due jobs as in flight and return them."""
+        with self.db_lock:
+            rows = self.db.execute(
+                "SELECT key, attempts, retries, full_data, full_ext, full_type, partial_data, partial_ext, partial_type "
+                "FROM uploads WHERE in_flight = 0 AND dead = 0 AND next_attempt_at <= ? ORDER BY created_at LIMIT ?",
+                (time.time(), limit)).fetchall()
+            self.db.executemany("UPDATE uploads SET in_flight = 1 WHERE key = ?", [(row[0],) for row in rows])
+            self.db.commit()
+        return rows
+
+    def _worker(self):
+        uploader = get_uploader(self.client)
+        while self.running:
+            jobs = self.claim()
+            if not jobs:
+                self.wakeup.wait(POLL_INTERVAL)
+                self.wakeup.clear()
+                continue
+
+            try:
+                errors = uploader.upload_pairs([
+                    (key, (full_data, full_ext, full_type), (partial_data, partial_ext, partial_type))
+                    for key, _, _, full_data, full_ext, full_type, partial_data, partial_ext, partial_type in jobs])
+                outage = False
+            except Exception as e:
+                errors = {i: str(e) for i in range(len(jobs))}
+                outage = True
+
+            # If a whole batch of several jobs failed, the link (or Supabase) is most
+            # likely down. A job failing while others succeed points at the job itself,
+            # and a lone job failing says nothing new about the link.
+            all_failed = all(error is not None for error in errors.values())
+            if not all_failed:
+                self.link_down = False
+            elif len(jobs) > 1:
+                self.link_down = True
+            transient = all_failed and (outage or self.link_down)
+            for i, job in enumerate(jobs):
+                key, attempts, retries, full_data, _, _, partial_data, _, _ = job
+                if errors[i] is None:
+                    self.succeeded(key, len(full_data) + len(partial_data))
+                else:
+                    self.failed(key, attempts, retries, errors[i], transient)
+
+    def succeeded(self, key, size):
+        with self.db_lock:
+            self.db.execute("DELETE FROM uploads WHERE key = ?", (key,))
+            # The link works, so stop waiting out the backoff of jobs that failed during an outage
+            self.db.execute("UPDATE uploads SET next_attempt_at = 0, retries = 0, transient = 0 "
+                            "WHERE in_flight = 0 AND dead = 0 AND transient = 1")
+            self.db.commit()
+        with self.metrics_lock:
+            self.counts["uploaded"] += 1
+            self.counts["bytes_uploaded"] += size
+        self.wakeup.set()
+
+    def failed(self, key, attempts, retries, error, transient=False):
+        """
+        Schedule a retry with backoff, or dead-letter the job after MAX_ATTEMPTS.
+        :param attempts: Job-specific failures so far; outages don't count
+        :param retries: Consecutive failures so far, of any kind
+        :param transient: Failure looks like an outage. It doesn't count toward MAX_ATTEMPTS
+            and its backoff is cut short once an upload succeeds.
+        """
+        if not transient:
+            attempts += 1
+        retries += 1
+        dead = attempts >= MAX_ATTEMPTS
+        delay = min(BACKOFF_BASE * 2 ** (retries - 1), BACKOFF_MAX) * random.uniform(0.5, 1.5)
+        with self.db_lock:
+            self.db.execute(
+                "UPDATE uploads SET in_flight = 0, attempts = ?, retries = ?, next_attempt_at = ?, last_error = ?, "
+                "transient = ?, dead = ? WHERE key = ?",
+                (attempts, retries, time.time() + delay, error, int(transient), int(dead), key))
+            self.db.commit()
+        with self.metrics_lock:
+            self.counts["failures"] += 1
+            if dead:
+                self.counts["dead"] += 1
+        if dead:
+            print(f"Upload {key} failed {attempts} times, giving up: {error}")
+            if self.on_dead is not None:
+                self.on_dead(key)
+        else:
+            kind = "outage" if transient else f"attempt {attempts}"
+            print(f"Upload {key} failed ({kind}, retrying in {delay:.0f}s): {error}")
+
+    # -------------------------------------------------------------------------
+    # Metrics
+    # -------------------------------------------------------------------------
+    def metrics(self):
+        with self.db_lock:
+            pending, oldest, spool_bytes = self.db.execute(
+                "SELECT COUNT(*), MIN(created_at), "
+                "COALESCE(SUM(LENGTH(full_data) + LENGTH(partial_data)), 0) FROM uploads WHERE dead = 0").fetchone()
+            dead, = self.db.execute("SELECT COUNT(*) FROM uploads WHERE dead = 1").fetchone()
+        with self.metrics_lock:
+            metrics = dict(self.counts)
+        metrics.update({
+            "pending": pending,
+            "oldest_pending_s": time.time() - oldest if oldest else 0.0,
+            "spool_bytes": spool_bytes,
+            "dead_letters": dead,
+        })
+        return metrics
+
+    def format_metrics(self):
+        m = self.metrics()
+        return (f"  uploads    pending={m['pending']} (oldest {m['oldest_pending_s']:.0f}s, "
+                f"{m['spool_bytes'] / 1e6:.1f} MB)  uploaded={m['uploaded']} "
+                f"({m['bytes_uploaded'] / 1e6:.1f} MB)  failures={m['failures']}  dead={m['dead_letters']}")
+
+    def close(self):
+        self.stop()
+        with self.db_lock:
+            self.db.close()
@@ -10,6 +10,7 @@ from datetime import datetime
 import cv2
 from process_image import ImageProcessor
 from supabase_upload import supabase, upload_stuff_images
+from lib.frame_ring import SharedCamera
 import time
 
 # Constants
@@ -25,13 +26,8 @@ client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
 client.connect(MQTT_BROKER_ADDRESS)
 client.loop_start()
 
-# Camera and image processing setup
-cap = cv2.VideoCapture(0)
-cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-cap.set(cv2.CAP_PROP_FPS, 30)
-cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc('M', 'J', 'P', 'G'))
+# Camera and image processing setup (frames come from core/node_camera.py)
+cap = SharedCamera()
 
 # Create images directory
 images_dir = 'images'
@@ -56,7 +52,6 @@ def process_camera_frame():
     if current_time - last_process_time < MIN_TIME_BETWEEN_FRAMES:
         return
     
-    cap.grab()  # Clear buffer
     ret, frame = cap.read()
     if not ret:
         print("Error reading from webcam")
@@ -69,17 +64,19 @@ def process_camera_frame():
         
         # Save and upload images if available
         if full_images and cropped_images:
+            # One best-shot pair per tracked object
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            full_path = os.path.join(images_dir, f"full_{timestamp}.png")
-            crop_path = os.path.join(images_dir, f"crop_{timestamp}.png")
-            
-            cv2.imwrite(full_path, full_images[0])
-            cv2.imwrite(crop_path, cropped_images[0])
-            
-            # Uncomment to enable Supabase upload
-            # success, error = upload_stuff_images(supabase, full_path, crop_path)
-            # if not success:
-            #     print(f"Failed to upload images: {error}")
+            for i, (full_image, cropped_image) in enumerate(zip(full_images, cropped_images)):
+                full_path = os.path.join(images_dir, f"full_{timestamp}_{i}.png")
+                crop_path = os.path.join(images_dir, f"crop_{timestamp}_{i}.png")
+                
+                cv2.imwrite(full_path, full_image)
+                cv2.imwrite(crop_path, cropped_image)
+                
+                # Uncomment to enable Supabase upload
+                # success, error = upload_stuff_images(supabase, full_path, crop_path)
+                # if not success:
+                #     print(f"Failed to upload images: {error}")
         
         last_process_time = current_time
             
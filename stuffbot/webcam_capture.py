@@ -1,44 +1,141 @@
 import cv2
 import os
 import threading
+import time
 from datetime import datetime
 
-class BufferlessVideoCapture:
-    def __init__(self, name):
+FIRST_FRAME_TIMEOUT = 5.0  # seconds read() waits for the camera to deliver its first frame
+
+class LatestFrameCapture:
+    def __init__(self, name, width=640, height=480, fps=15, mjpeg_passthrough=False, num_buffers=3):
+        """
+        Capture on a background thread into a small ring of preallocated buffers
+        and publish the newest one without locks, so readers never wait on cap.read().
+        :param mjpeg_passthrough: Keep the camera's MJPEG bytes undecoded; read_jpeg()
+            returns them as-is and read() decodes only when asked
+        :param num_buffers: Frame buffers to rotate through (3 = triple buffering)
+        """
         self.cap = cv2.VideoCapture(name)
         # Set camera properties
-        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-        self.cap.set(cv2.CAP_PROP_FPS, 15)
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        self.cap.set(cv2.CAP_PROP_FPS, fps)
         self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc('M', 'J', 'P', 'G'))
         self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-        
-        self.lock = threading.Lock()
-        self.frame = None
-        self.grabbed = False
+        self.mjpeg_passthrough = mjpeg_passthrough
+        if mjpeg_passthrough:
+            # V4L2 hands back the raw JPEG bytes instead of a decoded frame
+            self.cap.set(cv2.CAP_PROP_CONVERT_RGB, 0)
+
+        self.num_buffers = num_buffers
+        self.buffers = [None] * num_buffers
+        self.buffer_seq = [0] * num_buffers
+        # (seq, buffer index, timestamp) of the newest frame, replaced in one assignment
+        self.latest = (0, -1, 0.0)
+        self.grabbed = True
+        self.running = True
+
+        # Only used to wake wait_for_new(); the reader thread never holds it while capturing
+        self.new_frame = threading.Condition()
+
         self.t = threading.Thread(target=self._reader)
         self.t.daemon = True
         self.t.start()
 
     def _reader(self):
-        while True:
-            with self.lock:
-                self.grabbed, self.frame = self.cap.read()
-            if not self.grabbed:
+        seq = 0
+        while self.running:
+            seq += 1
+            # Never write into the buffer readers are currently being handed
+            idx = seq % self.num_buffers
+            self.buffer_seq[idx] = -1
+            if self.mjpeg_passthrough:
+                grabbed, data = self.cap.read()
+            else:
+                # Decode straight into the preallocated buffer once it exists
+                grabbed, data = self.cap.read(self.buffers[idx])
+            if not grabbed:
+                self.grabbed = False
                 break
+            self.buffers[idx] = data
+            self.buffer_seq[idx] = seq
+            self.latest = (seq, idx, time.time())
+            with self.new_frame:
+                self.new_frame.notify_all()
+        with self.new_frame:
+            self.new_frame.notify_all()
+
+    def latest_seq(self):
+        return self.latest[0]
+
+    def wait_for_new(self, seq, timeout=1.0):
+        """
+        Block until a frame newer than seq has been captured.
+        Returns the new sequence number, or None on timeout or camera failure.
+        """
+        with self.new_frame:
+            self.new_frame.wait_for(lambda: self.latest[0] > seq or not self.grabbed, timeout)
+        latest = self.latest[0]
+        return latest if latest > seq else None
+
+    def _latest_data(self, out=None):
+        while True:
+            seq, idx, timestamp = self.latest
+            if seq == 0:
+                return 0, 0.0, None
+            data = self.buffers[idx]
+            if out is not None and data.shape == out.shape:
+                out[...] = data
+                data = out
+            else:
+                data = data.copy()
+            if self.buffer_seq[idx] == seq:
+                return seq, timestamp, data
+            # Lapped by the capture thread mid-copy; take the newer frame
+
+    def read(self, out=None):
+        """
+        Newest decoded frame as (grabbed, frame).
+        :param out: Optional array to copy into instead of allocating a new frame
+        """
+        if self.latest[0] == 0:
+            # Block until the first frame, like cv2.VideoCapture.read() would
+            self.wait_for_new(0, FIRST_FRAME_TIMEOUT)
+        seq, _, data = self._latest_data(out if not self.mjpeg_passthrough else None)
+        if data is None:
+            return self.grabbed and seq > 0, None
+        if self.mjpeg_passthrough:
+            data = cv2.imdecode(data, cv2.IMREAD_COLOR)
+        return True, data
+
+    def read_with_seq(self, out=None):
+        """Like read() but returns (seq, timestamp, frame) for use with wait_for_new()."""
+        seq, timestamp, data = self._latest_data(out if not self.mjpeg_passthrough else None)
+        if data is not None and self.mjpeg_passthrough:
+            data = cv2.imdecode(data, cv2.IMREAD_COLOR)
+        return seq, timestamp, data
 
-    def read(self):
-        with self.lock:
-            frame = self.frame.copy() if self.frame is not None else None
-            grabbed = self.grabbed
-        return grabbed, frame
+    def read_jpeg(self, quality=90):
+        """
+        Newest frame as JPEG bytes. In passthrough mode these are the camera's
+        own bytes and nothing is decoded or re-encoded.
+        """
+        seq, _, data = self._latest_data()
+        if data is None:
+            return None
+        if self.mjpeg_passthrough:
+            return data.tobytes()
+        _, buffer = cv2.imencode('.jpg', data, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        return buffer.tobytes()
 
     def release(self):
+        self.running = False
+        self.t.join(timeout=1.0)
         self.cap.release()
 
 def main():
     # Initialize bufferless webcam
-    cap = BufferlessVideoCapture(0)
+    cap = LatestFrameCapture(0)
 
     # Create images directory if it doesn't exist
     os.makedirs('images', exist_ok=True)